@@ -10,14 +10,21 @@ Taaza Mandi – Flask app (fixed & hardened)
 """
 
 import os
+import io
+import csv
 import json
-import joblib
+import time
+import hashlib
+import re
+import uuid
+import zipfile
 import numpy as np
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from jinja2 import FileSystemBytecodeCache
+from supabase import Client
 import jwt
 from flask import (
     Flask,
@@ -28,14 +35,54 @@ from flask import (
     url_for,
     session,
     flash,
+    Response,
+    stream_with_context,
+    g,
 )
 
+from cache import TTLCache
+from catalog import parse_product_query, fetch_product_page, fetch_all_products, PAGE_SIZE_MAX
+from search import SearchIndex
+from geo import GeoIndex, parse_coordinates
+from facets import FacetCounts
+from events import EventBus
+from httpcache import HttpCache, tree_fingerprint
+from metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from jsonlog import JsonLogger, parse_sample_rates, request_id
+from sessions import ServerSessionInterface, make_store
+from supabase_pool import SupabasePool, UserClient
+from media import ImagePipeline, UploadTooLarge, spool_upload
+from bulk import ImageArchive, import_products, iter_rows
+from inference import (
+    FEATURES,
+    FEATURE_BOUNDS,
+    rows_from_json,
+    rows_from_csv,
+    validate_rows,
+    predict_batch,
+    MicroBatcher,
+    PredictionCache,
+    parse_quant_steps,
+    ModelLoader,
+)
+from mandi import MandiService, DataGovSource, DEFAULT_API_KEY, DEFAULT_BASE_URL, iso_to_day
+from timeseries import RESOLUTIONS
+
 # ==================== APP & CONFIG ====================
 
 load_dotenv()
 
 app = Flask(__name__)
 
+# Compiled templates are kept on disk, so new workers and restarts load bytecode
+# instead of recompiling every template on first render. Entries are checked
+# against the template source, so edited templates recompile.
+JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "jinja_cache"
+)
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_options = {**app.jinja_options, "bytecode_cache": FileSystemBytecodeCache(JINJA_CACHE_DIR)}
+
 # Secret key: don't ship the default in prod
 app.secret_key = os.environ.get(
     "FLASK_SECRET_KEY", "taaza-mandi-super-secret-key-change-in-production-2025"
@@ -57,6 +104,110 @@ def _make_session_permanent():
 # Timezone helper (Asia/Kolkata = UTC+05:30)
 IST = timezone(timedelta(hours=5, minutes=30))
 
+# ==================== LOGGING ====================
+
+# JSON lines on stdout from a background thread; request handlers never block on it
+log = JsonLogger(
+    capacity=int(os.environ.get("LOG_BUFFER_SIZE", 10000)),
+    sample_rates=parse_sample_rates(
+        os.environ.get("LOG_SAMPLE", "login.attempt=0.1,signup.attempt=0.1")
+    ),
+    min_level=os.environ.get("LOG_LEVEL", "info").lower(),
+    service="taaza-mandi",
+)
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+@app.before_request
+def _assign_request_id():
+    # Keep a proxy's X-Request-ID so its logs and ours line up
+    incoming = request.headers.get("X-Request-ID", "")
+    g.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+    g.request_id_token = request_id.set(g.request_id)
+
+@app.after_request
+def _echo_request_id(response):
+    if "request_id" in g:
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
+@app.teardown_request
+def _clear_request_id(_exc):
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        request_id.reset(token)
+
+# ==================== SESSIONS ====================
+
+# Server-side sessions: the cookie carries only an opaque id. SESSION_BACKEND=sqlite
+# is shared by every worker on the host, memory is per process, cookie keeps
+# Flask's signed-cookie sessions.
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "sqlite").lower()
+if SESSION_BACKEND != "cookie":
+    app.session_interface = ServerSessionInterface(
+        make_store(
+            SESSION_BACKEND,
+            path=os.environ.get("SESSION_DB_PATH")
+            or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sessions.sqlite3"),
+            maxsize=int(os.environ.get("SESSION_MEMORY_MAX", 10000)),
+        ),
+        idle_ttl=float(os.environ.get("SESSION_IDLE_SECONDS", 86400)),
+        sweep_interval=float(os.environ.get("SESSION_SWEEP_SECONDS", 300)),
+        log=log,
+    )
+
+# ==================== METRICS ====================
+
+metrics = Registry(prefix="taaza_", log=log)
+
+http_latency = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time until the response is ready, per Flask endpoint (streamed bodies excluded)",
+    ("endpoint", "method"),
+)
+http_responses = metrics.counter(
+    "http_responses_total", "Responses per Flask endpoint and status", ("endpoint", "method", "status")
+)
+http_in_flight = metrics.gauge(
+    "http_requests_in_flight", "Requests being handled, including open event streams"
+)
+supabase_latency = metrics.histogram(
+    "supabase_request_duration_seconds",
+    "Supabase PostgREST / Storage / Auth round trips from the shared pool",
+    ("service", "method", "status"),
+)
+jwt_latency = metrics.histogram(
+    "jwt_verify_duration_seconds",
+    "verify_supabase_token, by token cache outcome",
+    ("cache",),
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01),
+)
+predict_latency = metrics.histogram(
+    "model_predict_duration_seconds",
+    "One model call (a micro-batch or a /api/predict/batch request)",
+    ("source",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0),
+)
+
+@app.before_request
+def _metrics_start():
+    g.metrics_started = time.perf_counter()
+    http_in_flight.inc()
+
+@app.after_request
+def _metrics_observe(response):
+    started = g.get("metrics_started")
+    if started is not None:
+        endpoint = request.endpoint or "unmatched"  # keeps 404 paths out of the label set
+        http_latency.observe(time.perf_counter() - started, endpoint, request.method)
+        http_responses.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+@app.teardown_request
+def _metrics_finish(_exc):
+    if g.pop("metrics_started", None) is not None:
+        http_in_flight.dec()
+
 # ==================== SUPABASE CONFIG ====================
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
@@ -77,53 +228,217 @@ if _missing:
         f"Missing required env vars: {', '.join(_missing)}. Check your .env file"
     )
 
+# One keep-alive connection pool shared by the anon client and every
+# per-user client, instead of a fresh HTTP session per request.
+supabase_pool = SupabasePool(
+    SUPABASE_URL,
+    SUPABASE_ANON_KEY,
+    max_connections=int(os.environ.get("SUPABASE_POOL_SIZE", 20)),
+    max_keepalive=int(os.environ.get("SUPABASE_POOL_KEEPALIVE", 10)),
+    keepalive_expiry=float(os.environ.get("SUPABASE_POOL_KEEPALIVE_EXPIRY", 30)),
+    timeout=float(os.environ.get("SUPABASE_TIMEOUT", 20)),
+    http2=os.environ.get("SUPABASE_HTTP2", "1") != "0",
+    observe=lambda service, method, status, seconds: supabase_latency.observe(
+        seconds, service, method, str(status)
+    ),
+)
+
 # Base client (anon)
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
+supabase: Client = supabase_pool.anon_client()
 
-def supabase_with_user(token: str) -> Client:
-    """Return a client that sends the user's JWT in both Postgrest & Storage.
-    Works across supabase-py minor versions by trying available methods.
+def supabase_with_user(token: str) -> UserClient:
+    """Return a client that sends the user's JWT to PostgREST & Storage.
+    Only the auth headers are per-request; connections come from the shared pool.
     """
-    client: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
-    # PostgREST (database)
-    try:
-        client.postgrest.auth(token)
-    except Exception:
-        pass
-    # Storage
-    try:
-        client.storage.auth(token)  # newer versions
-    except Exception:
-        try:
-            client.storage.set_auth(token)  # older versions
-        except Exception:
-            pass
-    return client
+    return supabase_pool.for_user(token)
+
+# ==================== CATALOGUE CACHE ====================
+
+# Product reads are shared by every buyer/seller page view; keep them in-process
+# for a short TTL and drop everything when a new listing is inserted.
+catalog_cache = TTLCache(
+    maxsize=int(os.environ.get("CATALOG_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("CATALOG_CACHE_TTL", 30)),
+    name="catalog",
+)
+
+# ==================== HTTP CACHING ====================
+
+# Feed pages and catalogue APIs carry strong ETags derived from a catalogue
+# version (bumped on every insert / image update), so revalidations are
+# answered with 304 before any Supabase call. Text responses are compressed.
+http_cache = HttpCache(
+    build=os.environ.get("APP_VERSION") or tree_fingerprint(os.path.join(app.root_path, "templates")),
+    window=float(os.environ.get("ETAG_WINDOW_SECONDS", os.environ.get("CATALOG_CACHE_TTL", 30))),
+    min_size=int(os.environ.get("COMPRESS_MIN_BYTES", 1024)),
+    gzip_level=int(os.environ.get("GZIP_LEVEL", 6)),
+    brotli_quality=int(os.environ.get("BROTLI_QUALITY", 5)),
+)
+
+@app.after_request
+def _compress_response(response):
+    return http_cache.compress(response)
+
+def _catalogue_etag_key():
+    """What a catalogue page/API response depends on besides the data."""
+    if session.get("_flashes"):
+        return None  # the page would consume a flash message
+    user = json.dumps(session.get("user") or {}, sort_keys=True, default=str)
+    return user, session.get("user_role"), request.query_string
+
+def _index_json(payload: dict, took_ms: float):
+    """JSON for an index query with its timing in Server-Timing, not the body.
+
+    These responses carry a strong ETag (and compressed bodies are cached by
+    it), so the body must be the same bytes every time the tag is.
+    """
+    response = jsonify(payload)
+    response.headers["Server-Timing"] = f"index;dur={took_ms}"
+    return response
+
+# ==================== SEARCH INDEX ====================
+
+# Ranked, typo-tolerant product search served from memory. New listings are
+# added as this worker inserts them; a periodic rebuild picks up everything
+# else (other workers, edits, deletions).
+SEARCH_REBUILD_SECONDS = float(os.environ.get("SEARCH_REBUILD_SECONDS", 300))
+search_index = SearchIndex(log=log)
+
+# "Near me": listings placed on a lat/lon grid from their location text.
+# Rebuilt from the same catalogue load as the search index.
+geo_index = GeoIndex()
+NEARBY_MAX_RADIUS_KM = float(os.environ.get("NEARBY_MAX_RADIUS_KM", 2000))
+
+# Category / location / price-bucket counts for the feed filter dropdowns
+facet_counts = FacetCounts()
+
+def _load_catalogue():
+    rows = fetch_all_products(supabase)
+    geo_index.replace_all(rows)
+    facet_counts.replace_all(rows)
+    http_cache.bump()
+    return rows
+
+def _ensure_indexes():
+    search_index.ensure_loaded(_load_catalogue, SEARCH_REBUILD_SECONDS)
+
+# New and changed listings pushed to open buyer feeds over SSE
+product_events = EventBus(
+    capacity=int(os.environ.get("SSE_BUFFER_SIZE", 1000)),
+    max_subscribers=int(os.environ.get("SSE_MAX_CLIENTS", 5000)),
+)
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+
+def _products_inserted(rows):
+    http_cache.bump()
+    search_index.add_many(rows)
+    geo_index.add_many(rows)
+    facet_counts.add_many(rows)
+    if rows:
+        product_events.publish("listing", {"products": rows})
+
+# ==================== MANDI PRICES ====================
+
+# e-NAM prices are ingested server-side into a columnar store shared by all
+# workers; the market pages only ever ask this app for aggregates.
+ENAM_API_KEY = os.environ.get("ENAM_API_KEY", DEFAULT_API_KEY)
+ENAM_API_BASE = os.environ.get("ENAM_API_BASE", DEFAULT_BASE_URL)
+
+mandi_service = MandiService(
+    os.environ.get("MANDI_STORE_PATH")
+    or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "mandi_prices.npz"),
+    lambda: DataGovSource(ENAM_API_KEY, base_url=ENAM_API_BASE),
+    days=int(os.environ.get("MANDI_DAYS", 30)),
+    refresh_interval=float(os.environ.get("MANDI_REFRESH_SECONDS", 3600)),
+    retry_interval=float(os.environ.get("MANDI_RETRY_SECONDS", 60)),
+    log=log,
+)
 
 # ==================== LOAD ML MODEL (resilient) ====================
 
-MODEL_PATH = os.environ.get("MODEL_PATH") or os.path.join(
-    os.path.dirname(os.path.abspath(__file__)), "model", "final_model.pkl"
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model")
+
+# Prefer the flat-array export (faster to load and score) over the pickle
+MODEL_PATH = os.environ.get("MODEL_PATH") or next(
+    (
+        path
+        for path in (
+            os.path.join(MODEL_DIR, "final_model.npz"),
+            os.path.join(MODEL_DIR, "final_model.pkl"),
+        )
+        if os.path.exists(path)
+    ),
+    os.path.join(MODEL_DIR, "final_model.pkl"),
 )
 
-model = None
-try:
-    model = joblib.load(MODEL_PATH)
-    print(f"[OK] ML model loaded from {MODEL_PATH}")
-except Exception as e:
-    print(f"[WARN] Could not load ML model at {MODEL_PATH}: {e}")
+# Loaded on first use (not at import) and swapped in place when the file changes.
+# MODEL_MMAP_MODE=r maps the model's arrays so workers share them via the page cache.
+model_loader = ModelLoader(
+    MODEL_PATH,
+    mmap_mode=os.environ.get("MODEL_MMAP_MODE") or None,
+    check_interval=float(os.environ.get("MODEL_CHECK_INTERVAL", 2)),
+    log=log,
+)
+
+# Concurrent /predictor requests share one model call per micro-batch
+predict_batcher = MicroBatcher(
+    model_loader.get,
+    max_batch=int(os.environ.get("PREDICT_MAX_BATCH", 64)),
+    max_wait=float(os.environ.get("PREDICT_MAX_WAIT_MS", 5)) / 1000,
+    observe=lambda seconds: predict_latency.observe(seconds, "predictor"),
+)
+
+# Repeat / near-identical predictor inputs skip the forest entirely
+prediction_cache = PredictionCache(
+    steps=parse_quant_steps(os.environ.get("PREDICT_CACHE_STEPS")),
+    maxsize=int(os.environ.get("PREDICT_CACHE_SIZE", 4096)),
+)
 
 # ==================== AUTH HELPERS ====================
 
+# Clock tolerance for JWT validation
+JWT_LEEWAY_SECONDS = 60
+# Cached verifications are dropped this long before the token stops validating
+JWT_CACHE_MARGIN_SECONDS = 5
+
+# token digest -> successful verification result, kept until just before expiry
+token_cache = TTLCache(
+    maxsize=int(os.environ.get("JWT_CACHE_SIZE", 4096)),
+    ttl=None,
+    name="jwt",
+)
+
 def verify_supabase_token(token: str) -> dict:
+    """Verify a Supabase GoTrue JWT, reusing a cached result for repeat tokens.
+
+    Only successful verifications are cached, keyed by the token's SHA-256,
+    and each entry expires shortly before ``exp`` + leeway so a cached answer
+    never outlives what a fresh decode would accept.
+    """
+    if not token or not isinstance(token, str):
+        return {"status": "error", "message": "Missing token"}
+
+    started = time.perf_counter()
+    key = hashlib.sha256(token.encode()).digest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        jwt_latency.observe(time.perf_counter() - started, "hit")
+        return cached
+
+    result = _decode_supabase_token(token)
+    jwt_latency.observe(time.perf_counter() - started, "miss")
+    if result["status"] == "success" and isinstance(result["user"].get("exp"), (int, float)):
+        ttl = result["user"]["exp"] + JWT_LEEWAY_SECONDS - JWT_CACHE_MARGIN_SECONDS - time.time()
+        if ttl > 0:
+            token_cache.set(key, result, ttl=ttl)
+    return result
+
+def _decode_supabase_token(token: str) -> dict:
     """Verify a Supabase GoTrue JWT locally using the project's JWT secret.
     
     Fixed with clock tolerance to handle timing issues between client and server.
     """
     try:
-        if not token or not isinstance(token, str):
-            return {"status": "error", "message": "Missing token"}
-
         # Add clock tolerance for JWT validation (60 seconds leeway)
         payload = jwt.decode(
             token,
@@ -140,7 +455,7 @@ def verify_supabase_token(token: str) -> dict:
                 "require_nbf": False
             },
             # Add 60 second leeway for clock skew
-            leeway=timedelta(seconds=60)
+            leeway=timedelta(seconds=JWT_LEEWAY_SECONDS)
         )
         
         return {
@@ -160,10 +475,10 @@ def verify_supabase_token(token: str) -> dict:
         return {"status": "error", "message": "Token expired"}
     except jwt.InvalidTokenError as e:
         # Log the specific error for debugging
-        print(f"JWT validation error: {str(e)}")
+        log.warning("auth.invalid_token", error=str(e))
         return {"status": "error", "message": f"Invalid token: {e}"}
     except Exception as e:
-        print(f"Token verification exception: {str(e)}")
+        log.error("auth.verify_failed", error=str(e))
         return {"status": "error", "message": f"Token verification failed: {e}"}
 
 def require_auth(f):
@@ -175,7 +490,7 @@ def require_auth(f):
             return redirect(url_for("login"))
         tok = verify_supabase_token(token)
         if tok["status"] != "success":
-            print(f"[AUTH ERROR] {tok['message']}")
+            log.warning("auth.rejected", reason=tok["message"], path=request.path)
             session.clear()
             flash(f"Authentication failed: {tok['message']}", "error")
             return redirect(url_for("login"))
@@ -221,19 +536,23 @@ def login():
         if not token:
             return jsonify({"status": "error", "message": "Token is required"}), 400
 
-        print(f"[LOGIN] Verifying token for login attempt: {email}")
+        log.info("login.attempt", email=email)
         
         # Verify token with clock tolerance
         token_verification = verify_supabase_token(token)
         if token_verification["status"] != "success":
-            print(f"[LOGIN ERROR] Token verification failed: {token_verification['message']}")
+            log.warning("login.failed", email=email, reason=token_verification["message"])
             return jsonify({
                 "status": "error", 
                 "message": f"Authentication failed: {token_verification['message']}"
             }), 401
 
         verified_user = token_verification["user"]
-        
+
+        # New session id on login so a planted one can't be reused (server-side sessions)
+        if hasattr(session, "regenerate"):
+            session.regenerate()
+
         # Store in session
         session["access_token"] = token
         session["user"] = {
@@ -244,7 +563,7 @@ def login():
         }
         session.permanent = True
         
-        print(f"[LOGIN SUCCESS] Login successful for user: {session['user']['email']}")
+        log.info("login.success", email=session["user"]["email"], user_id=session["user"]["id"])
         
         return jsonify({
             "status": "success",
@@ -253,7 +572,7 @@ def login():
         })
         
     except Exception as e:
-        print(f"[LOGIN ERROR] Login error: {e}")
+        log.error("login.error", error=str(e))
         return jsonify({"status": "error", "message": f"Login failed: {str(e)}"}), 500
 
 @app.route("/signup", methods=["GET", "POST"])
@@ -299,12 +618,12 @@ def signup():
                 "message": f"Missing required fields: {', '.join(missing_fields)}"
             }), 400
 
-        print(f"[SIGNUP] Verifying token for signup attempt: {email}")
+        log.info("signup.attempt", email=email)
 
         # Verify token with clock tolerance
         token_verification = verify_supabase_token(token)
         if token_verification["status"] != "success":
-            print(f"[SIGNUP ERROR] Token verification failed: {token_verification['message']}")
+            log.warning("signup.failed", email=email, reason=token_verification["message"])
             return jsonify({
                 "status": "error",
                 "message": f"Authentication failed: {token_verification['message']}",
@@ -327,12 +646,15 @@ def signup():
             **verified_user.get("app_metadata", {})
         }
 
+        if hasattr(session, "regenerate"):
+            session.regenerate()
+
         # Store in session
         session["access_token"] = token
         session["user"] = user_data
         session.permanent = True
 
-        print(f"[SIGNUP SUCCESS] Signup successful for user: {email}")
+        log.info("signup.success", email=email, user_id=final_user_id)
 
         return jsonify({
             "status": "success",
@@ -342,7 +664,7 @@ def signup():
         })
 
     except Exception as e:
-        print(f"[SIGNUP ERROR] Signup error: {e}")
+        log.error("signup.error", error=str(e))
         return jsonify({"status": "error", "message": f"Registration failed: {str(e)}"}), 500
 
 @app.route("/forgot-password", methods=["GET", "POST"])
@@ -391,19 +713,24 @@ def user_select():
 
 @app.route("/seller-feed")
 @require_auth
+@http_cache.conditional(_catalogue_etag_key)
 def seller_feed():
     if session.get("user_role") != "seller":
         flash("Please select your role.", "info")
         return redirect(url_for("user_select"))
 
-    try:
+    def load():
         resp = (
             supabase.table("products")
             .select("*")
-            .eq("email", session["user"]["email"])
+            .eq("email", email)
             .execute()
         )
-        products = getattr(resp, "data", resp)
+        return getattr(resp, "data", resp)
+
+    try:
+        email = session["user"]["email"]
+        products = catalog_cache.get_or_load(("seller", email), load)
         return render_template("feeds/seller_feed.html", products=products, session=session)
     except Exception as e:
         return (
@@ -413,20 +740,21 @@ def seller_feed():
             <p>Error loading products: {e}</p>
             <a href="/user-select">Back to Role Selection</a>
         </div>
-        """
+        """,
+            500,
         )
 
 @app.route("/buyer-feed")
 @require_auth
+@http_cache.conditional(_catalogue_etag_key)
 def buyer_feed():
     if session.get("user_role") != "buyer":
         flash("Please select your role.", "info")
         return redirect(url_for("user_select"))
 
+    # Listings are paged in by the feed itself via /api/products
     try:
-        resp = supabase.table("products").select("*").execute()
-        products = getattr(resp, "data", resp)
-        return render_template("feeds/buyer_feed.html", products=products, session=session)
+        return render_template("feeds/buyer_feed.html", session=session)
     except Exception as e:
         return (
             f"""
@@ -500,6 +828,28 @@ def seller_profile():
 
 # ==================== PRODUCT UPLOAD ====================
 
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_MB", 10)) * 1024 * 1024
+UPLOAD_SPOOL_DIR = os.environ.get("UPLOAD_SPOOL_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "uploads"
+)
+
+def _images_ready(product_id, fields):
+    # Listings cached with the placeholder image are now out of date
+    catalog_cache.clear()
+    http_cache.bump()
+    search_index.patch(product_id, fields)
+    geo_index.patch(product_id, fields)
+    product_events.publish("listing-updated", {"id": product_id, **fields})
+
+# Resizing and Storage uploads happen here, after upload_product has returned
+image_pipeline = ImagePipeline(
+    supabase_with_user,
+    bucket="products",
+    workers=int(os.environ.get("IMAGE_WORKERS", 2)),
+    on_complete=_images_ready,
+    log=log,
+)
+
 @app.route("/upload-product", methods=["POST"])
 @require_auth
 def upload_product():
@@ -541,30 +891,17 @@ def upload_product():
         return jsonify({"status": "error", "message": f"Missing fields: {', '.join(missing)}"}), 400
 
     image_file = request.files.get("images")
-    image_urls: list[str] = []
-    bucket = "products"
+    spool_path = None
+    if image_file and image_file.filename:
+        try:
+            # Chunked copy to disk; the photo is never read whole into memory here
+            spool_path, _ = spool_upload(image_file.stream, UPLOAD_SPOOL_DIR, UPLOAD_MAX_BYTES)
+        except UploadTooLarge as e:
+            return jsonify({"status": "error", "message": str(e)}), 413
 
     try:
-        if image_file and image_file.filename:
-            safe_name = image_file.filename.replace("..", "/")
-            path = f"{user['id']}/{int(datetime.now(tz=IST).timestamp())}_{safe_name}"
-            file_bytes = image_file.read()
-
-            # Upload (works for both string path & bytes). We use bytes for API consistency.
-            upload_res = supa_user.storage.from_(bucket).upload(path=path, file=file_bytes)
-
-            # Handle error shapes across versions
-            if getattr(upload_res, "error", None):
-                return jsonify({"status": "error", "message": f"Storage upload failed: {upload_res.error}"}), 500
-
-            public_url_resp = supa_user.storage.from_(bucket).get_public_url(path)
-            if isinstance(public_url_resp, str):
-                image_urls = [public_url_resp]
-            else:
-                # supabase-py returns a dict in newer versions
-                image_urls = [public_url_resp.get("publicURL") or public_url_resp.get("publicUrl") or ""]
-        else:
-            image_urls = [f"https://via.placeholder.com/400x240?text={category or 'Product'}"]
+        # Placeholder until the image pipeline records the real derivatives
+        image_urls = [f"https://via.placeholder.com/400x240?text={category or 'Product'}"]
 
         product_data = {
             "title": title,
@@ -581,15 +918,101 @@ def upload_product():
         if getattr(response, "error", None):
             return jsonify({"status": "error", "message": f"DB insert failed: {response.error}"}), 500
 
+        # Any cached page or seller listing may now be missing this product
+        catalog_cache.clear()
+
+        rows = getattr(response, "data", None) or []
+        _products_inserted(rows)
+        product_id = rows[0].get("id") if rows else None
+        images_pending = False
+        if spool_path and product_id is not None:
+            safe_name = os.path.splitext(image_file.filename.replace("..", "").replace("/", "_"))[0]
+            base_path = f"{user['id']}/{int(datetime.now(tz=IST).timestamp())}_{safe_name}"
+            image_pipeline.submit(access_token, product_id, spool_path, base_path)
+            spool_path = None  # owned by the pipeline now
+            images_pending = True
+        elif spool_path:
+            log.warning("upload.no_product_id", email=user["email"])
+
         return jsonify({
             "status": "success",
             "message": "Product uploaded successfully",
             "product": product_data,
+            "images_pending": images_pending,
+            "geocoded": geo_index.gazetteer.geocode(location),
             "redirect_url": url_for("seller_feed"),
         })
 
     except Exception as e:
         return jsonify({"status": "error", "message": f"Upload failed: {e}"}), 500
+    finally:
+        if spool_path:
+            os.remove(spool_path)
+
+BULK_MAX_ROWS = int(os.environ.get("BULK_MAX_ROWS", 5000))
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", 200))
+BULK_MAX_ZIP_BYTES = int(os.environ.get("BULK_MAX_ZIP_MB", 200)) * 1024 * 1024
+
+@app.route("/api/products/bulk", methods=["POST"])
+@require_auth
+def bulk_upload_products():
+    """Import many listings from a CSV or JSONL ``file``.
+
+    Columns match /upload-product plus an optional ``image`` naming a photo
+    in the optional ``images`` zip. Returns a per-row report.
+    """
+    if session.get("user_role") != "seller":
+        return jsonify({"status": "error", "message": "Only sellers can upload products"}), 403
+
+    user = session.get("user") or {}
+    access_token = session.get("access_token")
+    if not user.get("email") or not access_token:
+        return jsonify({"status": "error", "message": "User session data missing"}), 401
+    tok = verify_supabase_token(access_token)
+    if tok["status"] != "success":
+        return jsonify({"status": "error", "message": tok["message"]}), 401
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify({"status": "error", "message": "Upload a CSV or JSONL file as 'file'"}), 400
+    fmt = (request.form.get("format") or os.path.splitext(upload.filename)[1].lstrip(".")).lower()
+    fmt = {"ndjson": "jsonl", "json": "jsonl"}.get(fmt, fmt)
+
+    archive, zip_path = None, None
+    zip_file = request.files.get("images")
+    try:
+        if zip_file and zip_file.filename:
+            zip_path, _ = spool_upload(zip_file.stream, UPLOAD_SPOOL_DIR, BULK_MAX_ZIP_BYTES)
+            archive = ImageArchive(zip_path, UPLOAD_MAX_BYTES)
+
+        stamp = int(datetime.now(tz=IST).timestamp())
+        report = import_products(
+            iter_rows(upload.stream, fmt),
+            supabase_with_user(access_token),
+            user["email"],
+            batch_size=BULK_BATCH_SIZE,
+            max_rows=BULK_MAX_ROWS,
+            images=archive,
+            submit_image=lambda product_id, path: image_pipeline.submit(
+                access_token, product_id, path, f"{user['id']}/{stamp}_bulk_{product_id}"
+            ),
+            spool_dir=UPLOAD_SPOOL_DIR,
+            on_inserted=_products_inserted,
+        )
+    except UploadTooLarge as e:
+        return jsonify({"status": "error", "message": str(e)}), 413
+    except (ValueError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    finally:
+        if archive is not None:
+            archive.close()
+        if zip_path:
+            os.remove(zip_path)
+
+    if report["summary"]["inserted"]:
+        catalog_cache.clear()
+    log.info("bulk.imported", email=user["email"], **report["summary"])
+    return jsonify({"status": "success", **report})
 
 @app.route("/post-upload")
 @require_auth
@@ -623,6 +1046,7 @@ def predictor():
 
     if request.method == "POST":
         try:
+            model, model_version = model_loader.current()
             if model is None:
                 return jsonify({"status": "error", "message": "Model not loaded on server"}), 503
 
@@ -634,21 +1058,20 @@ def predictor():
             rainfall = float(request.form.get("rainfall", 0))
 
             # Validation
-            for name, value, min_val, max_val in [
-                ("n", n, 0, 200),
-                ("p", p, 0, 150),
-                ("k", k, 0, 200),
-                ("humidity", humidity, 0, 100),
-                ("rainfall", rainfall, 0, 3000),
-            ]:
+            for name, value in zip(FEATURES, (n, p, k, humidity, rainfall)):
+                min_val, max_val = FEATURE_BOUNDS[name]
                 if value < min_val or value > max_val:
                     return jsonify({
                         "status": "error",
                         "message": f"{name} must be between {min_val} and {max_val}",
                     }), 400
 
-            features = np.array([[n, p, k, humidity, rainfall]], dtype=float)
-            pred = model.predict(features)[0]
+            # Run on the model read above, so the result is cached under its version
+            pred, _ = prediction_cache.get_or_predict(
+                [n, p, k, humidity, rainfall],
+                model_version,
+                lambda row: predict_batcher.predict(row, model=model),
+            )
             crop = str(pred).upper()
             current_time = datetime.now(tz=IST).strftime("%I:%M %p IST on %B %d, %Y")
 
@@ -681,10 +1104,124 @@ def predictor():
         """
         )
 
+@app.route("/api/predict/stats")
+@require_auth
+def predict_stats():
+    return jsonify({
+        "status": "success",
+        "model": model_loader.stats(),
+        "batcher": predict_batcher.stats(),
+    })
+
+PREDICT_BATCH_MAX_ROWS = int(os.environ.get("PREDICT_BATCH_MAX_ROWS", 10000))
+
+@app.route("/api/predict/batch", methods=["POST"])
+@require_auth
+def predict_batch_api():
+    """Crop recommendations for many rows in a single model call.
+
+    Accepts JSON ``{"rows": [{"n": .., "p": .., "k": .., "humidity": .., "rainfall": ..}]}``,
+    a ``text/csv`` body, or a CSV upload in ``file``. Results stream back in
+    input order as NDJSON (or CSV with ``?format=csv``), one record per row.
+    """
+    if session.get("user_role") != "seller":
+        return jsonify({"status": "error", "message": "Only sellers can use the predictor"}), 403
+    model = model_loader.get()
+    if model is None:
+        return jsonify({"status": "error", "message": "Model not loaded on server"}), 503
+
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"status": "error", "message": "format must be ndjson or csv"}), 400
+
+    try:
+        upload = request.files.get("file")
+        if upload and upload.filename:
+            X = rows_from_csv(upload.read().decode("utf-8-sig"))
+        elif request.mimetype == "text/csv":
+            X = rows_from_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(force=True, silent=True)
+            if data is None:
+                return jsonify({"status": "error", "message": "No data received"}), 400
+            X = rows_from_json(data)
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({"status": "error", "message": f"Could not read rows: {e}"}), 400
+
+    if len(X) > PREDICT_BATCH_MAX_ROWS:
+        return jsonify({
+            "status": "error",
+            "message": f"At most {PREDICT_BATCH_MAX_ROWS} rows per batch",
+        }), 413
+
+    errors = validate_rows(X)
+    valid = np.array([err is None for err in errors])
+    try:
+        with predict_latency.time("batch"):
+            labels, confidences = predict_batch(model, X[valid])
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Error during prediction: {e}"}), 500
+
+    def csv_line(cells) -> str:
+        buf = io.StringIO()
+        csv.writer(buf, lineterminator="\n").writerow(cells)
+        return buf.getvalue()
+
+    def generate():
+        results = iter(zip(labels, confidences))
+        if fmt == "csv":
+            yield csv_line(("row",) + FEATURES + ("crop_name", "confidence", "error"))
+        for i, err in enumerate(errors):
+            values = [None if np.isnan(v) else float(v) for v in X[i]]
+            if err is None:
+                crop, confidence = next(results)
+                record = {"row": i, "status": "success", "crop_name": crop.upper(), "confidence": confidence}
+            else:
+                record = {"row": i, "status": "error", "message": err}
+            if fmt == "csv":
+                cells = [i, *values, record.get("crop_name"), record.get("confidence"), record.get("message")]
+                yield csv_line(cells)
+            else:
+                record.update(zip(FEATURES, values))
+                yield json.dumps(record) + "\n"
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
 # ==================== STATIC PAGES ====================
 
+# These pages only vary by role and by the name / email the sidebar shows, so
+# the rendered HTML is cached per (build, template, role, those fields). The
+# build id changes with every deploy or template edit.
+PAGE_SESSION_FIELDS = ("first_name", "last_name", "email")
+
+page_cache = TTLCache(
+    maxsize=int(os.environ.get("PAGE_CACHE_SIZE", 256)),
+    ttl=float(os.environ.get("PAGE_CACHE_TTL", 3600)) or None,
+    name="pages",
+)
+
+def render_page(template: str) -> str:
+    user = session.get("user") or {}
+    key = (
+        http_cache.build,
+        request.script_root,
+        template,
+        session.get("user_role"),
+        *(user.get(field) for field in PAGE_SESSION_FIELDS),
+    )
+    return page_cache.get_or_load(key, lambda: render_template(template, session=session))
+
+def _page_etag_key():
+    """Validators for the role pages: the same inputs as the page cache key."""
+    if session.get("_flashes"):
+        return None
+    user = session.get("user") or {}
+    return (session.get("user_role"), *(user.get(field) for field in PAGE_SESSION_FIELDS))
+
 @app.route("/about")
 @require_auth
+@http_cache.conditional(_page_etag_key)
 def about():
     try:
         user_role = session.get("user_role")
@@ -693,9 +1230,9 @@ def about():
             return redirect(url_for("user_select"))
 
         if user_role == "buyer":
-            return render_template("constants/buyer/about_buy.html", session=session)
+            return render_page("constants/buyer/about_buy.html")
         if user_role == "seller":
-            return render_template("constants/seller/about_sell.html", session=session)
+            return render_page("constants/seller/about_sell.html")
 
         flash("Invalid user role. Please select your role again.", "error")
         session.pop("user_role", None)
@@ -715,6 +1252,7 @@ def about():
 
 @app.route("/contact")
 @require_auth
+@http_cache.conditional(_page_etag_key)
 def contact():
     try:
         user_role = session.get("user_role")
@@ -723,9 +1261,9 @@ def contact():
             return redirect(url_for("user_select"))
 
         if user_role == "buyer":
-            return render_template("constants/buyer/contact_buy.html", session=session)
+            return render_page("constants/buyer/contact_buy.html")
         if user_role == "seller":
-            return render_template("constants/seller/contact_sell.html", session=session)
+            return render_page("constants/seller/contact_sell.html")
 
         flash("Invalid user role. Please select your role again.", "error")
         session.pop("user_role", None)
@@ -745,6 +1283,7 @@ def contact():
 
 @app.route("/market")
 @require_auth
+@http_cache.conditional(_page_etag_key)
 def market():
     try:
         user_role = session.get("user_role")
@@ -752,10 +1291,11 @@ def market():
             flash("Please select whether you are a buyer or seller.", "info")
             return redirect(url_for("user_select"))
 
+        mandi_service.ensure_fresh()
         if user_role == "buyer":
-            return render_template("constants/buyer/market_buy.html", session=session)
+            return render_page("constants/buyer/market_buy.html")
         if user_role == "seller":
-            return render_template("constants/seller/market_sell.html", session=session)
+            return render_page("constants/seller/market_sell.html")
 
         flash("Invalid user role. Please select your role again.", "error")
         session.pop("user_role", None)
@@ -775,13 +1315,14 @@ def market():
 
 @app.route("/equipment")
 @require_auth
+@http_cache.conditional(_page_etag_key)
 def equipment():
     if session.get("user_role") != "seller":
         flash("Please select your role.", "info")
         return redirect(url_for("user_select"))
 
     try:
-        return render_template("constants/seller/equipment.html", session=session)
+        return render_page("constants/seller/equipment.html")
     except Exception as e:
         return f"""
         <div style="text-align:center; padding:50px; font-family:Arial;">
@@ -794,13 +1335,14 @@ def equipment():
 
 @app.route("/schemes")
 @require_auth
+@http_cache.conditional(_page_etag_key)
 def schemes():
     if session.get("user_role") != "seller":
         flash("Please select your role.", "info")
         return redirect(url_for("user_select"))
 
     try:
-        return render_template("constants/seller/schemes.html", session=session)
+        return render_page("constants/seller/schemes.html")
     except Exception as e:
         return f"""
         <div style="text-align:center; padding:50px; font-family:Arial;">
@@ -838,6 +1380,314 @@ def check_auth():
         })
     return jsonify({"status": "error", "authenticated": False, "message": "No user session"})
 
+@app.route("/api/products")
+@require_auth
+@http_cache.conditional(_catalogue_etag_key)
+def api_products():
+    """One page of the catalogue: filters, search and sort run in PostgREST.
+
+    Pass the returned ``next_cursor`` back as ``?cursor=`` for the next page.
+    """
+    try:
+        query = parse_product_query(request.args)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    try:
+        key = ("page", json.dumps(query, sort_keys=True))
+        page = catalog_cache.get_or_load(key, lambda: fetch_product_page(supabase, query))
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Error loading products: {e}"}), 500
+
+    return jsonify({"status": "success", **page})
+
+SEARCH_SORTS = ("relevance", "latest", "price-low", "price-high")
+
+@app.route("/api/search")
+@require_auth
+@http_cache.conditional(_catalogue_etag_key)
+def api_search():
+    """Ranked product search: prefix, typo and regional-name aware.
+
+    Same filters as /api/products; ``cursor`` is the ``next_cursor`` of
+    the previous page.
+    """
+    args = request.args
+    sort = (args.get("sort") or "relevance").strip()
+    if sort not in SEARCH_SORTS:
+        return jsonify({"status": "error", "message": f"Invalid sort: {sort}. Must be one of {', '.join(SEARCH_SORTS)}"}), 400
+    try:
+        limit = int(args.get("limit") or 12)
+        offset = int(args.get("cursor") or 0)
+        min_price = float(args["min_price"]) if args.get("min_price") else None
+        max_price = float(args["max_price"]) if args.get("max_price") else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit, cursor, min_price and max_price must be numbers"}), 400
+    if not 1 <= limit <= PAGE_SIZE_MAX or offset < 0:
+        return jsonify({"status": "error", "message": f"limit must be between 1 and {PAGE_SIZE_MAX}"}), 400
+
+    try:
+        _ensure_indexes()
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Search is unavailable: {e}"}), 503
+
+    result = search_index.search(
+        args.get("q") or args.get("search") or "",
+        category=(args.get("category") or "").strip(),
+        location=(args.get("location") or "").strip(),
+        min_price=min_price,
+        max_price=max_price,
+        sort=sort,
+        limit=limit,
+        offset=offset,
+    )
+    took_ms = result.pop("took_ms")
+    more = offset + limit < result["total"]
+    return _index_json({
+        "status": "success",
+        **result,
+        "next_cursor": str(offset + limit) if more else None,
+    }, took_ms)
+
+@app.route("/api/products/stream")
+@require_auth
+def api_products_stream():
+    """Server-Sent Events: ``listing`` for new products, ``listing-updated``
+    when a listing changes (e.g. its photos are ready).
+
+    Browsers reconnect with Last-Event-ID and get what they missed; a
+    ``reset`` event means too much was missed and the feed should reload.
+    """
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        events = product_events.listen(last_event_id, heartbeat=SSE_HEARTBEAT_SECONDS)
+    except RuntimeError as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+
+    def generate():
+        yield "retry: 5000\n\n"
+        for item in events:
+            if item is None:
+                yield ": keep-alive\n\n"  # also how a dead client gets noticed
+            else:
+                event_id, event, data = item
+                yield f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/api/products/facets")
+@require_auth
+@http_cache.conditional(_catalogue_etag_key)
+def api_product_facets():
+    """Listing counts per category, location and price bucket.
+
+    Takes the same category / location / min_price / max_price filters as
+    /api/products; each facet is counted under the other facets' filters.
+    """
+    args = request.args
+    try:
+        min_price = float(args["min_price"]) if args.get("min_price") else None
+        max_price = float(args["max_price"]) if args.get("max_price") else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "min_price and max_price must be numbers"}), 400
+
+    try:
+        _ensure_indexes()
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Facet counts are unavailable: {e}"}), 503
+
+    result = facet_counts.counts(
+        category=(args.get("category") or "").strip(),
+        location=(args.get("location") or "").strip(),
+        min_price=min_price,
+        max_price=max_price,
+    )
+    took_ms = result.pop("took_ms")
+    return _index_json({"status": "success", **result}, took_ms)
+
+@app.route("/api/products/nearby")
+@require_auth
+@http_cache.conditional(_catalogue_etag_key)
+def api_products_nearby():
+    """Listings nearest a point, closest first.
+
+    Pass ``lat``/``lon`` (e.g. from the browser) or a ``near`` place name /
+    pincode. ``radius_km`` limits the distance; ``cursor`` is the
+    ``next_cursor`` of the previous page.
+    """
+    args = request.args
+    try:
+        limit = int(args.get("limit") or 12)
+        offset = int(args.get("cursor") or 0)
+        radius_km = float(args["radius_km"]) if args.get("radius_km") else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit, cursor and radius_km must be numbers"}), 400
+    if not 1 <= limit <= PAGE_SIZE_MAX or offset < 0:
+        return jsonify({"status": "error", "message": f"limit must be between 1 and {PAGE_SIZE_MAX}"}), 400
+    if radius_km is not None and not 0 < radius_km <= NEARBY_MAX_RADIUS_KM:
+        return jsonify({"status": "error", "message": f"radius_km must be between 0 and {NEARBY_MAX_RADIUS_KM:g}"}), 400
+
+    if args.get("lat") or args.get("lon"):
+        coords = parse_coordinates(args.get("lat"), args.get("lon"))
+        if coords is None:
+            return jsonify({"status": "error", "message": "lat and lon must be valid coordinates"}), 400
+        origin = {"lat": coords[0], "lon": coords[1], "precision": "exact"}
+    elif (args.get("near") or "").strip():
+        origin = geo_index.gazetteer.geocode(args["near"])
+        if origin is None:
+            return jsonify({"status": "error", "message": f"Unknown place: {args['near'].strip()}"}), 400
+    else:
+        return jsonify({"status": "error", "message": "Pass lat and lon, or near"}), 400
+
+    try:
+        _ensure_indexes()
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Nearby search is unavailable: {e}"}), 503
+
+    result = geo_index.nearby(
+        origin["lat"],
+        origin["lon"],
+        radius_km=radius_km,
+        k=limit,
+        category=(args.get("category") or "").strip(),
+        offset=offset,
+    )
+    return _index_json({
+        "status": "success",
+        "origin": origin,
+        "products": result["products"],
+        "next_cursor": str(offset + limit) if result["has_more"] else None,
+    }, result["took_ms"])
+
+@app.route("/api/market/summary")
+@require_auth
+def api_market_summary():
+    """Aggregated e-NAM prices for the market pages, optionally filtered."""
+    args = request.args
+    try:
+        day_from = iso_to_day(args["from"]) if args.get("from") else None
+        day_to = iso_to_day(args["to"]) if args.get("to") else None
+        rows = min(max(int(args.get("rows") or 200), 0), 1000)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    mandi_service.ensure_fresh()
+    try:
+        summary = mandi_service.summary(
+            commodity=(args.get("commodity") or "").strip() or None,
+            state=(args.get("state") or "").strip() or None,
+            market=(args.get("market") or "").strip() or None,
+            day_from=day_from,
+            day_to=day_to,
+            rows=rows,
+        )
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Error loading market prices: {e}"}), 500
+
+    if summary is None:
+        # First run: ingestion is in progress in the background
+        return jsonify({"status": "pending", "message": "Market prices are being fetched"}), 202
+    return jsonify({"status": "success", **summary})
+
+@app.route("/api/market/series")
+@require_auth
+def api_market_series():
+    """Downsampled price points for one commodity (and optionally state).
+
+    ``resolution`` is day, week, month or auto (finest that fits ``points``).
+    """
+    args = request.args
+    resolution = (args.get("resolution") or "auto").strip()
+    if resolution not in ("auto",) + RESOLUTIONS:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid resolution: {resolution}. Must be one of auto, {', '.join(RESOLUTIONS)}",
+        }), 400
+    try:
+        day_from = iso_to_day(args["from"]) if args.get("from") else None
+        day_to = iso_to_day(args["to"]) if args.get("to") else None
+        points = min(max(int(args.get("points") or 90), 1), 1000)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    commodity = (args.get("commodity") or "").strip()
+    state = (args.get("state") or "").strip()
+    mandi_service.ensure_fresh()
+    series = mandi_service.series(
+        commodity=commodity,
+        state=state,
+        day_from=day_from,
+        day_to=day_to,
+        max_points=points,
+        resolution=resolution,
+    )
+    if series is None:
+        return jsonify({"status": "pending", "message": "Market prices are being fetched"}), 202
+    return jsonify({"status": "success", "commodity": commodity, "state": state, **series})
+
+@app.route("/api/cache-stats")
+@require_auth
+def cache_stats():
+    return jsonify({
+        "status": "success",
+        "caches": [catalog_cache.stats(), prediction_cache.stats(), token_cache.stats(), page_cache.stats()],
+        "mandi": mandi_service.stats(),
+        "supabase_pool": supabase_pool.stats(),
+        "image_pipeline": image_pipeline.stats(),
+        "search_index": search_index.stats(),
+        "geo_index": geo_index.stats(),
+        "facets": facet_counts.stats(),
+        "product_events": product_events.stats(),
+        "http": http_cache.stats(),
+        "logging": log.stats(),
+        "sessions": app.session_interface.stats() if SESSION_BACKEND != "cookie" else {"backend": "cookie"},
+    })
+
+# Scraped without a session; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+@metrics.collector
+def _component_metrics():
+    """Current component stats, read at scrape time."""
+    caches = [catalog_cache.stats(), prediction_cache.stats(), token_cache.stats(), page_cache.stats()]
+    yield "cache_hits", "Lookups answered from cache", {(c["name"],): c["hits"] for c in caches}, ("cache",)
+    yield "cache_misses", "Lookups that missed the cache", {(c["name"],): c["misses"] for c in caches}, ("cache",)
+    yield "cache_entries", "Entries held", {(c["name"],): c["size"] for c in caches}, ("cache",)
+
+    pool = supabase_pool.stats()
+    yield "supabase_pool_requests", "Requests sent through the shared pool", {(): pool["requests"]}, ()
+    yield "supabase_pool_connections_opened", "New upstream connections", {(): pool["connections_opened"]}, ()
+
+    batcher = predict_batcher.stats()
+    yield "predict_queue_depth", "Rows waiting for the next micro-batch", {(): batcher["queue_depth"]}, ()
+    images = image_pipeline.stats()
+    yield "image_queue_depth", "Uploads waiting for image processing", {(): images["queue_depth"]}, ()
+    yield "image_jobs_failed", "Image jobs that failed", {(): images["failed"]}, ()
+
+    yield "catalogue_listings", "Listings held by each in-memory index", {
+        ("search",): search_index.stats()["documents"],
+        ("geo",): geo_index.stats()["located"],
+        ("facets",): facet_counts.stats()["listings"],
+    }, ("index",)
+    yield "sse_subscribers", "Open /api/products/stream connections", {(): product_events.stats()["subscribers"]}, ()
+    http = http_cache.stats()
+    yield "http_not_modified", "Conditional GETs answered with 304", {(): http["not_modified"]}, ()
+    if SESSION_BACKEND != "cookie":
+        yield "sessions", "Server-side sessions stored", {(): app.session_interface.stats()["sessions"]}, ()
+    logging_stats = log.stats()
+    yield "log_queue_depth", "Log events waiting for the writer thread", {(): logging_stats["queued"]}, ()
+    yield "log_events_dropped", "Log events dropped because the queue was full", {(): logging_stats["dropped"]}, ()
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route("/api/update-profile", methods=["POST"])
 @require_auth
 def update_profile():
@@ -893,6 +1743,10 @@ def internal_error(_error):
 
 # ==================== RUN ====================
 
+# The dev server gives each /api/products/stream client a thread. In
+# production run an async worker so idle SSE clients are just greenlets,
+# e.g. gunicorn -k gevent --worker-connections 5000 app:app
+
 if __name__ == "__main__":
     print("Starting TAAZA MANDI Flask App...")
     print("Available routes:")
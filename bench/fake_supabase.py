@@ -0,0 +1,309 @@
+"""In-process stand-in for Supabase's PostgREST and Storage APIs.
+
+Enough of both for the app's own calls: products select (eq / comparison /
+ilike filters, ``or=(...)`` / ``and=(...)`` logic trees with quoted values as
+used by keyset cursors and text search, order, limit, offset), insert,
+update, and storage uploads. Every request can be delayed (--latency-ms,
+with jitter) and a fraction answered with 503 (--error-rate).
+
+    from fake_supabase import FakeSupabase, sign_token
+    server = FakeSupabase(latency_ms=20, error_rate=0.01).start()
+    server.seed_products(500)
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import jwt
+
+CATEGORIES = ("Vegetables", "Fruits", "Grains", "Pulses", "Spices")
+CROPS = ("Tomato", "Potato", "Onion", "Okra", "Wheat", "Basmati Rice", "Mango", "Banana", "Turmeric", "Chana")
+LOCATIONS = ("Maharashtra", "Punjab", "Uttar Pradesh", "Haryana", "Gujarat", "Nashik, Maharashtra", "Pune 411001")
+
+
+def sign_token(secret: str, sub: str = "bench-user", email: str = "bench@example.com",
+               ttl: int = 3600, **claims) -> str:
+    """A GoTrue-shaped HS256 JWT that verify_supabase_token accepts."""
+    now = int(time.time())
+    payload = {"sub": sub, "email": email, "role": "authenticated", "aud": "authenticated",
+               "iat": now, "exp": now + ttl, **claims}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def _coerce(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _matches(row: dict, column: str, expr: str) -> bool:
+    op, _, raw = expr.partition(".")
+    value = row.get(column)
+    if op == "eq":
+        return str(value) == raw
+    if op == "neq":
+        return str(value) != raw
+    if op == "is":
+        return value is None if raw == "null" else str(value).lower() == raw
+    if op in ("ilike", "like"):
+        needle = raw.replace("*", "%").strip("%")
+        haystack = str(value or "")
+        return needle.lower() in haystack.lower() if op == "ilike" else needle in haystack
+    if op in ("gt", "gte", "lt", "lte"):
+        if value is None:
+            return False
+        a, b = _coerce(value), _coerce(raw)
+        if type(a) is not type(b):
+            a, b = str(a), str(b)
+        return {"gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[op]
+    return True  # unknown operators are not applied
+
+
+def _split_top(text: str) -> list:
+    """Split ``a,and(b,c),"d,e"`` on commas outside parentheses and quotes."""
+    parts, depth, quoted, escaped, start = [], 0, False, False, 0
+    for i, ch in enumerate(text):
+        if escaped:
+            escaped = False
+        elif ch == "\\" and quoted:
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _unquote(raw: str) -> str:
+    if len(raw) >= 2 and raw[0] == raw[-1] == '"':
+        return raw[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return raw
+
+
+def _tree_matches(row: dict, mode: str, body: str) -> bool:
+    """Evaluate a logic tree body, e.g. ``(a.gt.1,and(a.eq.1,id.gt."7"))``."""
+    results = []
+    for term in _split_top(body[1:-1]):
+        term = term.strip()
+        if term.startswith(("and(", "or(")):
+            sub, _, rest = term.partition("(")
+            results.append(_tree_matches(row, sub, "(" + rest))
+        else:
+            column, _, expr = term.partition(".")
+            op, _, raw = expr.partition(".")
+            results.append(_matches(row, column, f"{op}.{_unquote(raw)}"))
+    return all(results) if mode == "and" else any(results)
+
+
+def _row_matches(row: dict, filters: list) -> bool:
+    for key, value in filters:
+        if key in ("or", "and"):
+            if not _tree_matches(row, key, value):
+                return False
+        elif not _matches(row, key, value):
+            return False
+    return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server_version = "FakeSupabase/1.0"
+
+    def setup(self):
+        super().setup()
+        fake = self.server.fake
+        with fake.lock:
+            fake.connections += 1
+        if fake.connect_delay:
+            time.sleep(fake.connect_delay)
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _handle(self, method):
+        fake = self.server.fake
+        body = self._body() if method in ("POST", "PATCH", "PUT") else b""
+        url = urlsplit(self.path)
+        with fake.lock:
+            fake.requests[method] = fake.requests.get(method, 0) + 1
+        fake.delay()
+        if fake.error_rate and random.random() < fake.error_rate:
+            with fake.lock:
+                fake.errors += 1
+            return self._reply(503, {"message": "injected failure", "code": "PGRST000"})
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._reply(401, {"message": "missing token"})
+
+        if url.path.startswith("/storage/v1/object/"):
+            key = unquote(url.path.split("/object/", 1)[1])
+            with fake.lock:
+                fake.objects[key] = len(body)
+            return self._reply(200, {"Key": key, "Id": str(len(fake.objects))})
+        if url.path.startswith("/rest/v1/"):
+            table = url.path[len("/rest/v1/"):]
+            params = parse_qsl(url.query, keep_blank_values=True)
+            if method == "GET":
+                return self._reply(200, fake.select(table, params))
+            if method == "POST":
+                rows = json.loads(body or b"[]")
+                return self._reply(201, fake.insert(table, rows if isinstance(rows, list) else [rows]))
+            if method == "PATCH":
+                return self._reply(200, fake.update(table, params, json.loads(body or b"{}")))
+        return self._reply(404, {"message": f"no route for {method} {url.path}"})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_HEAD(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+
+class FakeSupabase:
+    """Threaded local server holding tables as lists of dicts."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 connect_delay_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.connect_delay = connect_delay_ms / 1000
+        self.lock = threading.Lock()
+        self.tables = {"products": []}
+        self.objects = {}
+        self.requests = {}
+        self.errors = 0
+        self.connections = 0
+        self._next_id = 1
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeSupabase":
+        threading.Thread(target=self.httpd.serve_forever, name="fake-supabase", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def delay(self) -> None:
+        if self.latency or self.jitter:
+            time.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0.0))
+
+    # ---------- tables ----------
+
+    def insert(self, table: str, rows: list) -> list:
+        out = []
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            for row in rows:
+                row = {"id": self._next_id, "created_at": now.isoformat(), **row}
+                self._next_id += 1
+                self.tables.setdefault(table, []).append(row)
+                out.append(dict(row))
+        return out
+
+    def update(self, table: str, params: list, fields: dict) -> list:
+        filters = [(k, v) for k, v in params if k not in ("select", "order", "limit", "offset")]
+        out = []
+        with self.lock:
+            for row in self.tables.get(table, []):
+                if _row_matches(row, filters):
+                    row.update(fields)
+                    out.append(dict(row))
+        return out
+
+    def select(self, table: str, params: list) -> list:
+        filters, order, limit, offset, columns = [], [], None, 0, "*"
+        for key, value in params:
+            if key == "select":
+                columns = value
+            elif key == "order":
+                order = value.split(",")
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            else:
+                filters.append((key, value))
+        with self.lock:
+            rows = [row for row in self.tables.get(table, []) if _row_matches(row, filters)]
+        for spec in reversed(order):
+            column, _, direction = spec.partition(".")
+            desc = direction.startswith("desc")
+            present = [r for r in rows if r.get(column) is not None]
+            missing = [r for r in rows if r.get(column) is None]
+            present.sort(key=lambda r: _coerce(r[column]), reverse=desc)
+            rows = present + missing  # nulls last
+        rows = rows[offset:offset + limit if limit is not None else None]
+        if columns != "*":
+            keep = [c.strip() for c in columns.split(",")]
+            rows = [{c: r.get(c) for c in keep} for r in rows]
+        return rows
+
+    def seed_products(self, n: int, seed: int = 7, seller_email: str = "seller@example.com") -> None:
+        rng = random.Random(seed)
+        start = datetime.now(timezone.utc) - timedelta(days=30)
+        rows = []
+        for i in range(n):
+            crop = rng.choice(CROPS)
+            rows.append({
+                "title": f"{rng.choice(('Fresh', 'Organic', 'Premium', 'Desi'))} {crop}",
+                "description": f"{crop} harvested this week, grade {rng.choice('ABC')}.",
+                "quantity": f"{rng.randint(1, 50) * 10} kg",
+                "price": str(rng.randint(10, 200)),
+                "category": rng.choice(CATEGORIES),
+                "location": rng.choice(LOCATIONS),
+                "images": [f"https://via.placeholder.com/400x240?text={crop}"],
+                "seller_email": seller_email,
+                "created_at": (start + timedelta(minutes=i)).isoformat(),
+            })
+        self.insert("products", rows)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "injected_errors": self.errors,
+                "connections": self.connections,
+                "products": len(self.tables.get("products", [])),
+                "objects": len(self.objects),
+            }
@@ -0,0 +1,325 @@
+"""End-to-end load test of app.py against a local fake Supabase.
+
+Starts the fake PostgREST / Storage server (bench/fake_supabase.py) and the
+Flask app on a threaded WSGI server in this process, signs test JWTs with a
+throwaway secret, logs virtual users in and runs scripted profiles. Latency
+percentiles and throughput per step are written as JSON so runs can be
+compared between commits.
+
+    python bench/load.py --users 8 --duration 10 --out bench/results/$(git rev-parse --short HEAD).json
+    python bench/load.py --latency-ms 25 --error-rate 0.01 --profiles buyer-feed,upload
+    python bench/load.py --compare bench/results/base.json bench/results/new.json --fail-over 10
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_supabase import FakeSupabase, sign_token
+
+PROFILES = ("login", "buyer-feed", "predictor", "upload")
+# Smallest JPEG header the image pipeline will try (and fail) to decode;
+# the original is then uploaded as-is, like an unreadable photo
+JPEG_BYTES = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + bytes(4096)
+
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def start_app(fake: FakeSupabase, secret: str, workdir: str):
+    """Import app.py against the fake server and serve it on a free port."""
+    os.environ.update({
+        "SUPABASE_URL": fake.url,
+        "SUPABASE_ANON_KEY": "bench-anon-key",
+        "SUPABASE_JWT_SECRET": secret,
+        "SUPABASE_HTTP2": "0",
+        "FLASK_SECRET_KEY": secrets.token_hex(16),
+        "MANDI_STORE_PATH": os.path.join(workdir, "mandi_prices.npz"),
+        "UPLOAD_SPOOL_DIR": os.path.join(workdir, "uploads"),
+        "SESSION_DB_PATH": os.path.join(workdir, "sessions.sqlite3"),
+    })
+    import app as taaza
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, taaza.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return taaza, server, f"http://127.0.0.1:{server.server_port}"
+
+
+class VirtualUser:
+    """One browser: its own cookie jar and keep-alive connection."""
+
+    def __init__(self, base_url: str, secret: str, n: int, role: str):
+        self.email = f"{role}{n}@bench.example.com"
+        self.token = sign_token(secret, sub=f"bench-{role}-{n}", email=self.email)
+        self.role = role
+        self.cursor = None  # next_cursor of the last product page, for paging profiles
+        self.http = httpx.Client(base_url=base_url, follow_redirects=False, timeout=30,
+                                 headers={"Accept-Encoding": "gzip"})
+
+    def login(self) -> httpx.Response:
+        return self.http.post("/login", json={"token": self.token, "email": self.email})
+
+    def select_role(self) -> httpx.Response:
+        return self.http.post("/user-select", json={"role": self.role})
+
+    def close(self) -> None:
+        self.http.close()
+
+
+def _ok(resp: httpx.Response) -> bool:
+    if resp.status_code >= 400 or resp.is_redirect:
+        return False
+    if resp.headers.get("content-type", "").startswith("application/json"):
+        return resp.json().get("status") != "error"
+    return True
+
+
+def profile_steps(name: str, rng: random.Random):
+    """``(setup, steps)``: setup(user) runs once; each step is (label, user -> response)."""
+    from inference import FEATURE_BOUNDS, FEATURES
+
+    def seller(user):
+        user.login()
+        user.select_role()
+
+    if name == "login":
+        return (lambda user: None), [("POST /login", VirtualUser.login)]
+    if name == "buyer-feed":
+        def buyer(user):
+            user.login()
+            user.select_role()
+
+        def products(user, follow: bool):
+            params = {"limit": 6}
+            if follow and user.cursor:
+                params["cursor"] = user.cursor
+            resp = user.http.get("/api/products", params=params)
+            if resp.status_code == 200:
+                user.cursor = resp.json().get("next_cursor")
+            return resp
+        return buyer, [
+            ("GET /buyer-feed", lambda user: user.http.get("/buyer-feed")),
+            ("GET /api/products", lambda user: products(user, follow=False)),
+            ("GET /api/products?cursor", lambda user: products(user, follow=True)),
+        ]
+    if name == "predictor":
+        def predict(user):
+            form = {f: round(rng.uniform(*FEATURE_BOUNDS[f]), 1) for f in FEATURES}
+            return user.http.post("/predictor", data=form)
+        return seller, [("POST /predictor", predict)]
+    if name == "upload":
+        def upload(user):
+            form = {
+                "title": f"Bench {rng.choice(('Tomato', 'Onion', 'Mango'))}",
+                "description": "Load test listing",
+                "quantity": "100 kg",
+                "price": str(rng.randint(10, 200)),
+                "category": rng.choice(("Vegetables", "Fruits")),
+                "location": "Pune 411001",
+            }
+            return user.http.post("/upload-product", data=form, files={"images": ("bench.jpg", JPEG_BYTES, "image/jpeg")})
+        return seller, [("POST /upload-product", upload)]
+    raise ValueError(f"Unknown profile: {name}. Must be one of {', '.join(PROFILES)}")
+
+
+def run_profile(name: str, base_url: str, secret: str, users: int, duration: float, warmup: float,
+                seed: int) -> dict:
+    role = "buyer" if name == "buyer-feed" else "seller"
+    setup, steps = profile_steps(name, random.Random(seed))
+    timings = {label: [] for label, _ in steps}
+    errors = {label: 0 for label, _ in steps}
+    lock = threading.Lock()
+    iterations = [0]
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def worker(n):
+        user = VirtualUser(base_url, secret, n, role)
+        try:
+            setup(user)
+            while True:
+                now = time.perf_counter()
+                if now >= stop_at:
+                    return
+                measured = now >= start_at
+                for label, step in steps:
+                    t0 = time.perf_counter()
+                    try:
+                        ok = _ok(step(user))
+                    except httpx.HTTPError:
+                        ok = False
+                    elapsed = time.perf_counter() - t0
+                    if measured:
+                        with lock:
+                            timings[label].append(elapsed)
+                            errors[label] += not ok
+                if measured:
+                    with lock:
+                        iterations[0] += 1
+        finally:
+            user.close()
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    out = {}
+    for label, values in timings.items():
+        ms = np.array(values) * 1000
+        out[f"{name} {label}"] = {
+            "requests": len(values),
+            "errors": errors[label],
+            "error_rate": round(errors[label] / len(values), 4) if values else None,
+            "throughput_rps": round(len(values) / duration, 2),
+            "mean_ms": round(float(ms.mean()), 3) if values else None,
+            "p50_ms": round(float(np.percentile(ms, 50)), 3) if values else None,
+            "p95_ms": round(float(np.percentile(ms, 95)), 3) if values else None,
+            "p99_ms": round(float(np.percentile(ms, 99)), 3) if values else None,
+            "max_ms": round(float(ms.max()), 3) if values else None,
+        }
+    return {"steps": out, "iterations": iterations[0], "iterations_per_second": round(iterations[0] / duration, 2)}
+
+
+def print_results(report: dict) -> None:
+    meta = report["meta"]
+    print(f"commit {meta['commit']}{' (dirty)' if meta['dirty'] else ''}, {meta['users']} users, "
+          f"{meta['duration']}s per profile, fake latency {meta['latency_ms']} ms, error rate {meta['error_rate']}")
+    print(f"{'step':40s}{'reqs':>7s}{'err':>6s}{'rps':>9s}{'p50_ms':>9s}{'p95_ms':>9s}{'p99_ms':>9s}")
+    for label, r in report["results"].items():
+        if not r["requests"]:
+            print(f"{label:40s}{0:7d}")
+            continue
+        print(f"{label:40s}{r['requests']:7d}{r['errors']:6d}{r['throughput_rps']:9.1f}"
+              f"{r['p50_ms']:9.2f}{r['p95_ms']:9.2f}{r['p99_ms']:9.2f}")
+
+
+def compare(base: dict, current: dict, fail_over: float | None) -> int:
+    """Print p50/p95/throughput deltas; non-zero if any p95 regressed past ``fail_over`` %."""
+    print(f"base {base['meta']['commit']} -> current {current['meta']['commit']}")
+    print(f"{'step':40s}{'p50_ms':>17s}{'p95_ms':>19s}{'rps':>17s}")
+    regressions = []
+    for label, cur in current["results"].items():
+        old = base["results"].get(label)
+        if not old or not old["requests"] or not cur["requests"]:
+            print(f"{label:40s}{'(no baseline)':>17s}")
+            continue
+
+        def delta(key):
+            return (cur[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+
+        print(f"{label:40s}{cur['p50_ms']:9.2f} ({delta('p50_ms'):+5.1f}%)"
+              f"{cur['p95_ms']:9.2f} ({delta('p95_ms'):+6.1f}%)"
+              f"{cur['throughput_rps']:9.1f} ({delta('throughput_rps'):+5.1f}%)")
+        if fail_over is not None and delta("p95_ms") > fail_over:
+            regressions.append(label)
+    if regressions:
+        print(f"p95 regressed more than {fail_over}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users per profile")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per profile")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each profile")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="fake Supabase delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=2.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake Supabase requests failing with 503")
+    parser.add_argument("--seed-products", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT",
+                        help="BASE [CURRENT]: compare reports (runs the benchmark when CURRENT is omitted)")
+    parser.add_argument("--fail-over", type=float, help="exit 1 if any p95 is this many percent slower than BASE")
+    args = parser.parse_args(argv)
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            return compare(json.load(f), json.load(g), args.fail_over)
+
+    random.seed(args.seed)
+    fake = FakeSupabase(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=0.0).start()
+    fake.seed_products(args.seed_products, seed=args.seed)
+    secret = secrets.token_hex(32)
+    workdir = tempfile.mkdtemp(prefix="taaza_bench_")
+    taaza, server, base_url = start_app(fake, secret, workdir)
+    fake.error_rate = args.error_rate  # seeding and startup never fail
+
+    report = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "duration": args.duration,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "seed_products": args.seed_products,
+        },
+        "results": {},
+        "profiles": {},
+    }
+    try:
+        for name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+            result = run_profile(name, base_url, secret, args.users, args.duration, args.warmup, args.seed)
+            report["results"].update(result.pop("steps"))
+            report["profiles"][name] = result
+    finally:
+        server.shutdown()
+        fake.stop()
+    report["fake_supabase"] = fake.stats()
+    report["app"] = {
+        "supabase_pool": taaza.supabase_pool.stats(),
+        "image_pipeline": taaza.image_pipeline.stats(),
+        "http": taaza.http_cache.stats(),
+    }
+
+    print_results(report)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    if args.compare:
+        with open(args.compare[0]) as f:
+            return compare(json.load(f), report, args.fail_over)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
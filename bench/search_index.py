@@ -0,0 +1,74 @@
+"""Time SearchIndex builds and queries on a synthetic catalogue.
+
+    python bench/search_index.py --listings 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from search import SearchIndex
+
+CROPS = ["Tomato", "Potato", "Onion", "Okra", "Cauliflower", "Brinjal", "Green Chilli", "Turmeric",
+         "Coriander", "Wheat", "Basmati Rice", "Maize", "Mustard", "Groundnut", "Mango", "Banana",
+         "Apple", "Grapes", "Ginger", "Garlic", "Spinach", "Peas", "Carrot"]
+ADJECTIVES = ["Fresh", "Organic", "Premium", "Farm", "Desi", "Export quality", "Hybrid", "Local"]
+LOCATIONS = ["Pune", "Nashik", "Mumbai", "Bengaluru", "Mysuru", "Chennai", "Jaipur", "Lucknow",
+             "Indore", "Nagpur", "Hubli", "Kolhapur"]
+CATEGORIES = ["Vegetables", "Fruits", "Grains", "Pulses", "Spices", "Others"]
+QUERIES = ["tomato", "tamatar", "tomatoes", "tama", "organic aloo", "pyaz nashik", "grnoundnut",
+           "fresh", "mirchi pune", "premium basmati rice", "lot 4242", "xyzzy"]
+
+
+def listings(n, seed):
+    rng = random.Random(seed)
+    for i in range(n):
+        crop = rng.choice(CROPS)
+        yield {
+            "id": i,
+            "title": f"{rng.choice(ADJECTIVES)} {crop}",
+            "description": f"{rng.choice(ADJECTIVES)} {crop.lower()} harvested this week near "
+                           f"{rng.choice(LOCATIONS)}. Grade {rng.choice('ABC')}, lot {i}.",
+            "category": rng.choice(CATEGORIES),
+            "location": rng.choice(LOCATIONS),
+            "price": str(rng.randint(10, 200)),
+            "created_at": f"2025-08-{rng.randint(1, 28):02d}T10:00:00+00:00",
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--listings", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.replace_all(listings(args.listings, args.seed))
+    print(f"Indexed {args.listings} listings in {time.perf_counter() - start:.2f} s: {index.stats()}")
+
+    start = time.perf_counter()
+    index.add({"id": "new", "title": "Kesar Aam", "description": "fresh", "category": "Fruits",
+               "location": "Pune", "price": "90"})
+    print(f"Incremental add: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    print(f"{'query':24s}{'hits':>8s}{'median_ms':>11s}{'p95_ms':>8s}  top")
+    for q in QUERIES:
+        index.search(q)
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            result = index.search(q, limit=12)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        top = ", ".join(p["title"] for p in result["products"][:2])
+        print(f"{q:24s}{result['total']:8d}{statistics.median(timings):11.2f}"
+              f"{timings[int(len(timings) * 0.95) - 1]:8.2f}  {top}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Compare signed-cookie sessions with the server-side session stores.
+
+Builds a small Flask app with the app's session settings, logs one client in
+with a login-sized session (a Supabase JWT plus user metadata), then times
+authenticated GETs. Reports the Cookie header each request uploads, how
+often the response re-sends Set-Cookie, and the time per request.
+
+    python bench/session_store.py --requests 5000
+"""
+import argparse
+import os
+import secrets
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from flask import Flask, jsonify, session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_supabase import sign_token
+from sessions import ServerSessionInterface, make_store
+
+
+def make_app(backend: str, workdir: str) -> Flask:
+    app = Flask(__name__)
+    app.secret_key = secrets.token_hex(16)
+    app.config.update(PERMANENT_SESSION_LIFETIME=timedelta(days=1), SESSION_COOKIE_HTTPONLY=True)
+    if backend != "cookie":
+        store = make_store(backend, path=os.path.join(workdir, f"{backend}.sqlite3"))
+        app.session_interface = ServerSessionInterface(store)
+
+    @app.before_request
+    def _make_session_permanent():
+        session.permanent = True
+
+    @app.post("/login")
+    def login():
+        # Roughly what login + user-select put in the session
+        session["access_token"] = sign_token(
+            secrets.token_hex(32),
+            email="farmer@example.com",
+            user_metadata={"first_name": "Asha", "last_name": "Patil", "phone": "+919800000000", "state": "Maharashtra"},
+            app_metadata={"provider": "email", "providers": ["email"]},
+            session_id=secrets.token_hex(16),
+        )
+        session["user"] = {
+            "id": secrets.token_hex(16),
+            "email": "farmer@example.com",
+            "first_name": "Asha",
+            "last_name": "Patil",
+            "phone": "+919800000000",
+            "state": "Maharashtra",
+            "full_name": "Asha Patil",
+            "user_type": "seller",
+            "provider": "email",
+            "providers": ["email"],
+        }
+        session["user_role"] = "seller"
+        return jsonify({"status": "success"})
+
+    @app.get("/feed")
+    def feed():
+        return jsonify({"status": "success", "email": session["user"]["email"], "role": session.get("user_role")})
+
+    return app
+
+
+def run(backend: str, requests: int, workdir: str) -> dict:
+    app = make_app(backend, workdir)
+    client = app.test_client()
+    client.post("/login")
+    cookie = client.get_cookie("session")
+    cookie_bytes = len(f"session={cookie.value}")
+
+    timings, set_cookies = [], 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        resp = client.get("/feed")
+        timings.append(time.perf_counter() - started)
+        set_cookies += "Set-Cookie" in resp.headers
+        assert resp.json["email"] == "farmer@example.com"
+    timings.sort()
+    return {
+        "backend": backend,
+        "cookie_bytes": cookie_bytes,
+        "set_cookie_rate": set_cookies / requests,
+        "median_us": statistics.median(timings) * 1e6,
+        "p95_us": timings[int(len(timings) * 0.95) - 1] * 1e6,
+        "upload_kb": cookie_bytes * requests / 1024,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--backends", default="cookie,memory,sqlite")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="taaza_sessions_")
+    results = [run(b.strip(), args.requests, workdir) for b in args.backends.split(",") if b.strip()]
+
+    print(f"{args.requests} authenticated requests per backend")
+    print(f"{'backend':10s}{'cookie_B':>10s}{'set_cookie':>12s}{'median_us':>11s}{'p95_us':>9s}{'upload_KB':>11s}")
+    for r in results:
+        print(f"{r['backend']:10s}{r['cookie_bytes']:10d}{r['set_cookie_rate']:12.2%}"
+              f"{r['median_us']:11.1f}{r['p95_us']:9.1f}{r['upload_kb']:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
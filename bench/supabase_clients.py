@@ -0,0 +1,89 @@
+"""Compare per-request Supabase clients against the shared connection pool.
+
+Simulates the upload_product round trips (storage upload + products insert)
+against a local fake Supabase server, or a real project with --url/--key.
+The fake server can add a delay per new connection (--connect-delay-ms) to
+stand in for the TCP + TLS handshake a fresh client pays on every upload.
+
+    python bench/supabase_clients.py --uploads 200 --connect-delay-ms 30
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import warnings
+
+from supabase import create_client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_supabase import FakeSupabase
+from supabase_pool import SupabasePool
+
+
+def upload(client, i):
+    path = f"bench/{time.time_ns()}_{i}.jpg"
+    client.storage.from_("products").upload(path=path, file=b"\xff\xd8" + b"0" * 2048)
+    client.storage.from_("products").get_public_url(path)
+    client.table("products").insert({"title": f"bench {i}", "price": "10"}).execute()
+
+
+def per_request_client(url, key, token):
+    """What upload_product used to do: a brand new client per request."""
+    client = create_client(url, key)
+    client.postgrest.auth(token)
+    client.storage._client.headers["Authorization"] = f"Bearer {token}"
+    client.storage._headers["Authorization"] = f"Bearer {token}"
+    return client
+
+
+def run(label, make_client, uploads):
+    timings = []
+    for i in range(uploads):
+        start = time.perf_counter()
+        upload(make_client(), i)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "label": label,
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+        "total_s": sum(timings),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--uploads", type=int, default=200)
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0)
+    parser.add_argument("--url", help="real Supabase URL (default: local fake server)")
+    parser.add_argument("--key", default=os.environ.get("SUPABASE_ANON_KEY", "anon"))
+    parser.add_argument("--token", default=os.environ.get("BENCH_USER_TOKEN", "user-token"))
+    args = parser.parse_args(argv)
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    url = args.url
+    if url is None:
+        server = FakeSupabase(connect_delay_ms=args.connect_delay_ms).start()
+        url = server.url
+
+    pool = SupabasePool(url, args.key, http2=False)
+    results = [
+        run("per-request client", lambda: per_request_client(url, args.key, args.token), args.uploads),
+        run("pooled client", lambda: pool.for_user(args.token), args.uploads),
+    ]
+
+    print(f"{args.uploads} uploads against {url}")
+    print(f"{'':20s}{'median_ms':>11s}{'p95_ms':>9s}{'total_s':>9s}")
+    for r in results:
+        print(f"{r['label']:20s}{r['median_ms']:11.2f}{r['p95_ms']:9.2f}{r['total_s']:9.2f}")
+    saved = results[0]["median_ms"] - results[1]["median_ms"]
+    print(f"Saved per upload (median): {saved:.2f} ms")
+    print(f"Pool: {pool.stats()}")
+    if args.url is None:
+        print(f"Server saw {server.stats()['connections']} connections in total")
+
+
+if __name__ == "__main__":
+    main()
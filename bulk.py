@@ -0,0 +1,248 @@
+from __future__ import annotations
+"""
+Taaza Mandi – bulk product import
+- CSV or JSONL listings parsed and validated one row at a time
+- Valid rows inserted in batched multi-row PostgREST requests; a rejected
+  batch is split in halves so only the offending rows fail
+- Optional zip of photos; each referenced image goes through the image pipeline
+- Per-row report plus rows/second throughput
+"""
+
+import codecs
+import csv
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+REQUIRED_FIELDS = ("title", "description", "quantity", "price", "category", "location")
+CATEGORIES = ("Vegetables", "Fruits", "Grains", "Pulses", "Spices", "Others")
+MAX_FIELD_LENGTH = {"title": 200, "description": 5000, "quantity": 100, "category": 50, "location": 200}
+
+
+class _Lines:
+    """Decode a binary stream one physical line at a time, counting lines.
+
+    Decoding per line pins a bad byte to the line it is on.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.line_no = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    def __iter__(self):
+        for raw in self.stream:
+            self.line_no += 1
+            yield self._decoder.decode(raw)
+        tail = self._decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+def iter_rows(stream, fmt: str):
+    """Yield ``(line_number, dict_or_error)`` from a binary upload stream.
+
+    Rows are decoded lazily, so memory stays flat however long the file is.
+    A line that is not valid UTF-8 ends the file with an error row, so rows
+    already read keep their place in the report.
+    """
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError("format must be csv or jsonl")
+    lines = _Lines(stream)
+    try:
+        if fmt == "csv":
+            yield from _csv_rows(lines)
+        else:
+            yield from _jsonl_rows(lines)
+    except UnicodeDecodeError as e:
+        if lines.line_no <= 1:
+            raise  # nothing read yet: reject the whole file
+        yield lines.line_no, f"Line is not valid UTF-8 ({e.reason}); the rest of the file was not read"
+
+
+def _csv_rows(lines: _Lines):
+    reader = csv.DictReader(lines)
+    try:
+        fieldnames = reader.fieldnames
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV header: {e}")
+    if not fieldnames:
+        raise ValueError("CSV is empty")
+    reader.fieldnames = [name.strip().lower() for name in fieldnames]
+    missing = [f for f in REQUIRED_FIELDS if f not in reader.fieldnames]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            # e.g. a field over csv.field_size_limit(); the reader resumes at the next line
+            yield lines.line_no, f"Invalid CSV: {e}"
+            continue
+        if any((v or "").strip() for v in row.values() if isinstance(v, str)):
+            yield reader.line_num, row
+
+
+def _jsonl_rows(lines: _Lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield lines.line_no, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield lines.line_no, "Each line must be a JSON object"
+            continue
+        yield lines.line_no, {str(k).strip().lower(): v for k, v in row.items()}
+
+
+def validate_product(row: dict) -> tuple:
+    """Return ``(product, image_name, errors)`` for one parsed row."""
+    product, errors = {}, []
+    for field in REQUIRED_FIELDS:
+        value = str(row.get(field) if row.get(field) is not None else "").strip()
+        if not value:
+            errors.append(f"{field} is required")
+        elif len(value) > MAX_FIELD_LENGTH.get(field, 1000):
+            errors.append(f"{field} is longer than {MAX_FIELD_LENGTH[field]} characters")
+        product[field] = value
+
+    if product["price"]:
+        try:
+            price = float(product["price"])
+        except ValueError:
+            price = math.nan
+        if not math.isfinite(price):  # float() also accepts "nan", "inf" and "1e400"
+            errors.append("price must be a number")
+        elif price <= 0:
+            errors.append("price must be greater than 0")
+    if product["category"] and product["category"] not in CATEGORIES:
+        errors.append(f"category must be one of {', '.join(CATEGORIES)}")
+
+    image = str(row.get("image") or "").strip()
+    return product, image, errors
+
+
+class ImageArchive:
+    """Photos from an uploaded zip, looked up by file name."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.zip = zipfile.ZipFile(path)
+        self.max_bytes = max_bytes
+        self.members = {
+            os.path.basename(info.filename): info
+            for info in self.zip.infolist()
+            if not info.is_dir() and not os.path.basename(info.filename).startswith(".")
+        }
+
+    def extract(self, name: str, directory: str) -> str:
+        """Copy one member to a spool file; raises ValueError if missing or too big."""
+        info = self.members.get(os.path.basename(name))
+        if info is None:
+            raise ValueError(f"image {name} not found in zip")
+        if info.file_size > self.max_bytes:
+            raise ValueError(f"image {name} is larger than {self.max_bytes // (1024 * 1024)} MB")
+        fd, path = tempfile.mkstemp(prefix="bulk_", dir=directory)
+        with os.fdopen(fd, "wb") as out, self.zip.open(info) as src:
+            shutil.copyfileobj(src, out, 256 * 1024)
+        return path
+
+    def close(self) -> None:
+        self.zip.close()
+
+
+def import_products(rows, client, seller_email: str, batch_size: int = 200, max_rows: int = 5000,
+                    images: ImageArchive | None = None, submit_image=None, spool_dir: str = "",
+                    on_inserted=None) -> dict:
+    """Validate ``rows`` as they stream in and insert them ``batch_size`` at a time.
+
+    ``submit_image(product_id, spool_path)`` hands a photo to the image
+    pipeline once its product row exists; ``on_inserted(rows)`` receives
+    each batch of rows as PostgREST returned them.
+    """
+    started = time.perf_counter()
+    results = []
+    batch = []  # (result, product, image_name)
+    counts = {"rows": 0, "inserted": 0, "failed": 0, "images_queued": 0, "insert_requests": 0}
+
+    def insert(items):
+        """Insert ``items``; on failure split in halves so only bad rows fail."""
+        counts["insert_requests"] += 1
+        try:
+            resp = client.table("products").insert([product for _, product, _ in items]).execute()
+            if getattr(resp, "error", None):
+                raise RuntimeError(resp.error)
+            inserted = getattr(resp, "data", None) or []
+        except Exception as e:
+            if len(items) > 1:
+                middle = len(items) // 2
+                insert(items[:middle])
+                insert(items[middle:])
+                return
+            result = items[0][0]
+            result.update(status="error", errors=[f"insert failed: {e}"])
+            counts["failed"] += 1
+            return
+
+        if on_inserted is not None and inserted:
+            on_inserted(inserted)
+        for i, (result, _, image) in enumerate(items):
+            product_id = inserted[i].get("id") if i < len(inserted) else None
+            result.update(status="inserted", id=product_id)
+            counts["inserted"] += 1
+            if image and product_id is not None:
+                _queue_image(result, product_id, image)
+
+    def flush():
+        if batch:
+            insert(list(batch))
+            batch.clear()
+
+    def _queue_image(result, product_id, image):
+        if images is None or submit_image is None:
+            result["image"] = "skipped: no image zip uploaded"
+            return
+        try:
+            path = images.extract(image, spool_dir)
+        except (ValueError, zipfile.BadZipFile) as e:
+            result["image"] = f"skipped: {e}"
+            return
+        submit_image(product_id, path)
+        result["image"] = "queued"
+        counts["images_queued"] += 1
+
+    for line_no, row in rows:
+        if counts["rows"] >= max_rows:
+            results.append({"line": line_no, "status": "error", "errors": [f"more than {max_rows} rows; rest ignored"]})
+            break
+        counts["rows"] += 1
+        result = {"line": line_no}
+        results.append(result)
+        if isinstance(row, str):
+            result.update(status="error", errors=[row])
+            counts["failed"] += 1
+            continue
+        product, image, errors = validate_product(row)
+        if errors:
+            result.update(status="error", errors=errors)
+            counts["failed"] += 1
+            continue
+        product["seller_email"] = seller_email
+        product["images"] = [f"https://via.placeholder.com/400x240?text={product['category']}"]
+        batch.append((result, product, image))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    elapsed = time.perf_counter() - started
+    counts["seconds"] = round(elapsed, 3)
+    counts["rows_per_second"] = round(counts["rows"] / elapsed, 1) if elapsed > 0 else None
+    return {"summary": counts, "results": results}
@@ -0,0 +1,154 @@
+from __future__ import annotations
+"""
+Taaza Mandi – product catalogue queries
+- Keyset (cursor) pagination for the buyer feed
+- Category / location / price-range / search filters pushed into PostgREST
+- Stable sort orders with an ``id`` tie-breaker
+"""
+
+import base64
+import json
+
+PAGE_SIZE_DEFAULT = 12
+PAGE_SIZE_MAX = 50
+
+# sort name -> (column, descending). "popular" has no backing column yet,
+# so it falls back to the newest listings.
+SORTS = {
+    "latest": ("created_at", True),
+    "popular": ("created_at", True),
+    "price-low": ("price", False),
+    "price-high": ("price", True),
+}
+
+# Characters with meaning inside PostgREST logic trees / ilike patterns
+_SEARCH_STRIP = str.maketrans("", "", ',()"*%\\')
+
+
+def encode_cursor(row: dict, sort: str) -> str:
+    """Opaque cursor pointing just past ``row`` in the given sort order."""
+    column, _ = SORTS[sort]
+    raw = json.dumps({"s": sort, "v": row.get(column), "id": row.get("id")})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> dict | None:
+    """Return ``{"v": ..., "id": ...}`` or raise ValueError for a bad cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(data, dict) or data.get("s") != sort or data.get("id") is None:
+        raise ValueError("Cursor does not match the requested sort")
+    return {"v": data.get("v"), "id": data["id"]}
+
+
+def _optional_float(args, name: str) -> float | None:
+    raw = (args.get(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+
+def parse_product_query(args) -> dict:
+    """Normalise request args into a query dict; raises ValueError on bad input."""
+    sort = (args.get("sort") or "latest").strip()
+    if sort not in SORTS:
+        raise ValueError(f"Invalid sort: {sort}. Must be one of {', '.join(SORTS)}")
+
+    try:
+        limit = int(args.get("limit") or PAGE_SIZE_DEFAULT)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1 or limit > PAGE_SIZE_MAX:
+        raise ValueError(f"limit must be between 1 and {PAGE_SIZE_MAX}")
+
+    min_price = _optional_float(args, "min_price")
+    max_price = _optional_float(args, "max_price")
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise ValueError("min_price cannot be greater than max_price")
+
+    return {
+        "category": (args.get("category") or "").strip(),
+        "location": (args.get("location") or "").strip(),
+        "search": (args.get("search") or "").translate(_SEARCH_STRIP).strip(),
+        "min_price": min_price,
+        "max_price": max_price,
+        "sort": sort,
+        "limit": limit,
+        "cursor": decode_cursor((args.get("cursor") or "").strip(), sort),
+    }
+
+
+def _quote(value) -> str:
+    """Quote a value for use inside a PostgREST ``or=(...)`` expression."""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _keyset_filter(column: str, desc: bool, cursor: dict) -> str:
+    op = "lt" if desc else "gt"
+    v, last_id = _quote(cursor["v"]), _quote(cursor["id"])
+    if cursor["v"] is None:
+        # NULLs sort last in both directions here; only the id breaks ties.
+        return f"and({column}.is.null,id.{op}.{last_id})"
+    return f"{column}.{op}.{v},and({column}.eq.{v},id.{op}.{last_id}),{column}.is.null"
+
+
+def fetch_product_page(client, query: dict) -> dict:
+    """Run one page of the product listing against PostgREST.
+
+    Fetches ``limit + 1`` rows so we know whether another page exists
+    without a separate count query.
+    """
+    column, desc = SORTS[query["sort"]]
+    q = client.table("products").select("*")
+
+    if query["category"]:
+        q = q.eq("category", query["category"])
+    if query["location"]:
+        q = q.eq("location", query["location"])
+    if query["min_price"] is not None:
+        q = q.gte("price", query["min_price"])
+    if query["max_price"] is not None:
+        q = q.lte("price", query["max_price"])
+    if query["search"]:
+        term = f"*{query['search']}*"
+        q = q.or_(f"title.ilike.{term},description.ilike.{term},category.ilike.{term}")
+    if query["cursor"]:
+        q = q.or_(_keyset_filter(column, desc, query["cursor"]))
+
+    q = (
+        q.order(column, desc=desc, nullsfirst=False)
+        .order("id", desc=desc)
+        .limit(query["limit"] + 1)
+    )
+    resp = q.execute()
+    rows = getattr(resp, "data", resp) or []
+
+    has_more = len(rows) > query["limit"]
+    rows = rows[: query["limit"]]
+    next_cursor = encode_cursor(rows[-1], query["sort"]) if has_more and rows else None
+    return {"products": rows, "next_cursor": next_cursor}
+
+
+SEARCH_COLUMNS = "id,title,description,quantity,price,category,location,images,seller_email,created_at"
+
+
+def fetch_all_products(client, page_size: int = 1000, columns: str = SEARCH_COLUMNS) -> list:
+    """Every listing, paged by id so large catalogues never time out one request."""
+    rows, last_id = [], None
+    while True:
+        q = client.table("products").select(columns).order("id").limit(page_size)
+        if last_id is not None:
+            q = q.gt("id", last_id)
+        page = getattr(q.execute(), "data", None) or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_id = page[-1]["id"]
@@ -0,0 +1,139 @@
+from __future__ import annotations
+"""
+Taaza Mandi – in-process pub/sub for live listing updates
+- Publishers append to one bounded ring buffer; payloads are JSON-encoded
+  once, however many subscribers there are
+- A subscriber is just a cursor into the buffer plus a wait on a shared
+  condition, so idle connections cost no queue and no polling
+- Event ids are ``<epoch>-<seq>``; reconnects with Last-Event-ID replay what
+  was missed, or get a ``reset`` event if it has fallen out of the buffer
+"""
+
+import json
+import threading
+import time
+import weakref
+from collections import deque
+from itertools import islice
+
+
+class EventBus:
+    """Bounded ring buffer of events with blocking, resumable readers."""
+
+    def __init__(self, capacity: int = 1000, max_subscribers: int = 5000):
+        self.capacity = capacity
+        self.max_subscribers = max_subscribers
+        # Ids from a previous process (or another worker) never match this one
+        self.epoch = f"{time.time_ns():x}"
+        self._events = deque(maxlen=capacity)  # (seq, event name, json data)
+        self._cond = threading.Condition()
+        self._seq = 0
+        self.subscribers = 0
+        self.published = 0
+        self.delivered = 0
+        self.replayed = 0
+        self.resets = 0
+
+    def publish(self, event: str, data) -> str:
+        """Append an event and wake every subscriber; returns its id."""
+        payload = json.dumps(data, default=str)
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event, payload))
+            self.published += 1
+            self._cond.notify_all()
+            return f"{self.epoch}-{self._seq}"
+
+    def _resume_from(self, last_event_id: str | None) -> tuple:
+        """``(cursor, replay_ok)`` for a Last-Event-ID; caller holds the lock."""
+        if not last_event_id:
+            return self._seq, True
+        epoch, _, seq = last_event_id.rpartition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self._seq:
+            return self._seq, False
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if int(seq) < oldest - 1:
+            return self._seq, False  # some missed events were already overwritten
+        return int(seq), True
+
+    def _after(self, cursor: int) -> list:
+        """Buffered events newer than ``cursor``; caller holds the lock."""
+        if not self._events or cursor >= self._seq:
+            return []
+        start = max(cursor - self._events[0][0] + 1, 0)
+        return list(islice(self._events, start, None))
+
+    def listen(self, last_event_id: str | None = None, heartbeat: float = 15.0):
+        """Yield ``(id, event, json)`` as events arrive; ``None`` on idle heartbeats.
+
+        Raises RuntimeError straight away when ``max_subscribers`` are
+        already listening; otherwise the slot is taken under the same lock.
+        The WSGI server closes the generator when the client goes away, which
+        frees its slot (so does dropping a generator that never started).
+        """
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                raise RuntimeError("Too many live listeners")
+            self.subscribers += 1
+            cursor, replay_ok = self._resume_from(last_event_id)
+            if replay_ok:
+                pending = self._after(cursor)
+                self.replayed += len(pending)
+            else:
+                pending = []
+                self.resets += 1
+        held = [True]
+
+        def release():
+            with self._cond:
+                if held[0]:
+                    held[0] = False
+                    self.subscribers -= 1
+
+        stream = self._stream(cursor, replay_ok, pending, heartbeat, release)
+        weakref.finalize(stream, release)
+        return stream
+
+    def _stream(self, cursor: int, replay_ok: bool, pending: list, heartbeat: float, release):
+        try:
+            if not replay_ok:
+                yield f"{self.epoch}-{cursor}", "reset", "{}"
+            while True:
+                if not pending:
+                    with self._cond:
+                        if cursor >= self._seq:
+                            self._cond.wait(heartbeat)
+                        pending = self._after(cursor)
+                        behind = bool(pending) and pending[0][0] > cursor + 1
+                        if behind:
+                            # Fell further behind than the ring buffer holds
+                            self.resets += 1
+                            pending, cursor = [], self._seq
+                    if behind:
+                        yield f"{self.epoch}-{cursor}", "reset", "{}"
+                        continue
+                    if not pending:
+                        yield None
+                        continue
+                with self._cond:
+                    self.delivered += len(pending)
+                for seq, event, payload in pending:
+                    cursor = seq
+                    yield f"{self.epoch}-{seq}", event, payload
+                pending = []
+        finally:
+            release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "subscribers": self.subscribers,
+                "max_subscribers": self.max_subscribers,
+                "published": self.published,
+                "delivered": self.delivered,
+                "replayed": self.replayed,
+                "resets": self.resets,
+                "buffered": len(self._events),
+                "capacity": self.capacity,
+                "last_event_id": f"{self.epoch}-{self._seq}",
+            }
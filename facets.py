@@ -0,0 +1,147 @@
+from __future__ import annotations
+"""
+Taaza Mandi – facet counts for the feed filters
+- Listing counts per category, location and price bucket
+- Kept as counts per (category, location, bucket) combination, so each
+  facet can be counted under the other selected filters without touching
+  the listings themselves
+- Incremental add / remove on insert; full rebuild with the catalogue load
+"""
+
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+
+# Rupees per unit; the last bucket is open-ended
+PRICE_EDGES = (0, 20, 50, 100, 200, 500)
+
+
+def _price(value) -> float | None:
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price >= 0 else None
+
+
+class FacetCounts:
+    """Thread-safe facet counters over product rows."""
+
+    def __init__(self, price_edges=PRICE_EDGES):
+        self.price_edges = tuple(price_edges)
+        self.buckets = [
+            {
+                "value": f"{low}-{high}" if high is not None else f"{low}+",
+                "min_price": low,
+                "max_price": high,
+            }
+            for low, high in zip(self.price_edges, self.price_edges[1:] + (None,))
+        ]
+        self._lock = threading.Lock()
+        self._combos = Counter()  # (category, location, bucket index or -1) -> listings
+        self._key_of = {}         # product id -> combination
+        self.loaded_at = None
+
+    def _key(self, row: dict) -> tuple:
+        price = _price(row.get("price"))
+        bucket = bisect_right(self.price_edges, price) - 1 if price is not None else -1
+        return (str(row.get("category") or "").strip(), str(row.get("location") or "").strip(), bucket)
+
+    # ---------- updates ----------
+
+    def add_many(self, rows) -> None:
+        """Count product rows; a row with a known id replaces the old one."""
+        with self._lock:
+            for row in rows:
+                self._add(row)
+
+    def _add(self, row: dict) -> None:
+        product_id = row.get("id")
+        if product_id is not None:
+            self._remove(product_id)
+        key = self._key(row)
+        self._combos[key] += 1
+        if product_id is not None:
+            self._key_of[product_id] = key
+
+    def remove(self, product_id) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id) -> None:
+        key = self._key_of.pop(product_id, None)
+        if key is None:
+            return
+        self._combos[key] -= 1
+        if self._combos[key] <= 0:
+            del self._combos[key]
+
+    def replace_all(self, rows) -> None:
+        fresh = FacetCounts(self.price_edges)
+        fresh.add_many(rows)
+        with self._lock:
+            self._combos, self._key_of = fresh._combos, fresh._key_of
+            self.loaded_at = time.time()
+
+    # ---------- queries ----------
+
+    def _bucket_in_range(self, bucket: int, min_price, max_price) -> bool:
+        if min_price is None and max_price is None:
+            return True
+        if bucket < 0:
+            return False
+        info = self.buckets[bucket]
+        if min_price is not None and info["min_price"] < min_price:
+            return False
+        if max_price is not None and (info["max_price"] is None or info["max_price"] > max_price):
+            return False
+        return True
+
+    def counts(self, category: str = "", location: str = "", min_price=None, max_price=None,
+               top: int = 50) -> dict:
+        """Counts for every facet, each under the *other* facets' selections.
+
+        So with ``category=Fruits`` the category facet still lists every
+        category (for switching), while location and price only count fruit.
+        A price range selects the buckets lying wholly inside it.
+        """
+        started = time.perf_counter()
+        by_category, by_location, by_bucket = Counter(), Counter(), Counter()
+        total = 0
+        with self._lock:
+            combos = list(self._combos.items())
+        for (c, l, b), n in combos:
+            category_ok = not category or c == category
+            location_ok = not location or l == location
+            price_ok = self._bucket_in_range(b, min_price, max_price)
+            if location_ok and price_ok and c:
+                by_category[c] += n
+            if category_ok and price_ok and l:
+                by_location[l] += n
+            if category_ok and location_ok and b >= 0:
+                by_bucket[b] += n
+            if category_ok and location_ok and price_ok:
+                total += n
+
+        def ranked(counter, limit=None):
+            items = sorted(counter.items(), key=lambda kv: (-kv[1], kv[0]))
+            return [{"value": value, "count": count} for value, count in items[:limit]]
+
+        return {
+            "total": total,
+            "facets": {
+                "category": ranked(by_category),
+                "location": ranked(by_location, top),
+                "price": [{**info, "count": by_bucket.get(i, 0)} for i, info in enumerate(self.buckets)],
+            },
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "listings": sum(self._combos.values()),
+                "combinations": len(self._combos),
+                "loaded_at": self.loaded_at,
+            }
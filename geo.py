@@ -0,0 +1,319 @@
+from __future__ import annotations
+"""
+Taaza Mandi – "near me" product discovery
+- Free-text listing locations geocoded offline from a bundled
+  state / district / pincode-prefix table (geodata/places.csv)
+- Listings bucketed in a lat/lon grid so a nearby query only looks at the
+  cells around the buyer instead of every listing
+- k-nearest and radius queries ordered by great-circle distance
+"""
+
+import csv
+import math
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+PLACES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "geodata", "places.csv")
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+_PINCODE = re.compile(r"(?<!\d)([1-9]\d{2})\s?(\d{3})(?!\d)")
+_WORD = re.compile(r"[a-z0-9&]+")
+
+
+def _words(text) -> list:
+    return _WORD.findall(str(text or "").casefold())
+
+
+def haversine_km(lat, lon, lats, lons) -> np.ndarray:
+    """Great-circle distance from one point to arrays of points."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def parse_coordinates(lat, lon) -> tuple | None:
+    """``(lat, lon)`` as floats if both are valid coordinates, else None."""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+class Gazetteer:
+    """Offline geocoder for the place names and pincodes sellers type."""
+
+    def __init__(self, path: str = PLACES_PATH):
+        self.places = []
+        self._names = {}      # word tuple -> [place, ...]
+        self._pincodes = {}   # 2/3-digit prefix -> place; districts win over states
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                place = {
+                    "name": row["name"],
+                    "state": row["state"] or row["name"],
+                    "precision": row["kind"],
+                    "lat": float(row["lat"]),
+                    "lon": float(row["lon"]),
+                }
+                self.places.append(place)
+                for name in [row["name"]] + [a for a in row["aliases"].split("|") if a]:
+                    self._names.setdefault(tuple(_words(name)), []).append(place)
+                for prefix in row["pincodes"].split():
+                    current = self._pincodes.get(prefix)
+                    if current is None or current["precision"] == "state":
+                        self._pincodes[prefix] = place
+        self._longest = max(len(key) for key in self._names)
+        self._memo = {}       # listings repeat a few hundred distinct locations
+
+    def geocode(self, text) -> dict | None:
+        """Best match for a free-text location: pincode, then district, then state.
+
+        Returns ``{"lat", "lon", "precision", "place", "state"}`` or None.
+        """
+        text = str(text or "")
+        if text in self._memo:
+            return self._memo[text]
+        if len(self._memo) >= 50000:
+            self._memo.clear()
+        result = self._memo[text] = self._geocode(text)
+        return result
+
+    def _geocode(self, text: str) -> dict | None:
+        for match in _PINCODE.finditer(text):
+            pincode = match.group(1) + match.group(2)
+            for prefix in (pincode[:3], pincode[:2]):
+                place = self._pincodes.get(prefix)
+                if place is not None:
+                    return self._result(place, "pincode" if place["precision"] == "district" else "state")
+
+        words = _words(text)
+        districts, states = [], []
+        i = 0
+        while i < len(words):
+            # Longest name starting at this word ("uttar pradesh" before "uttar")
+            for n in range(min(self._longest, len(words) - i), 0, -1):
+                places = self._names.get(tuple(words[i:i + n]))
+                if places:
+                    for place in places:
+                        (states if place["precision"] == "state" else districts).append(place)
+                    i += n
+                    break
+            else:
+                i += 1
+
+        if districts:
+            # "Aurangabad, Bihar": a named state settles ambiguous districts
+            named = {place["state"] for place in states}
+            chosen = next((p for p in districts if p["state"] in named), districts[0])
+            return self._result(chosen, "district")
+        if states:
+            return self._result(states[0], "state")
+        return None
+
+    @staticmethod
+    def _result(place: dict, precision: str) -> dict:
+        return {
+            "lat": place["lat"],
+            "lon": place["lon"],
+            "precision": precision,
+            "place": place["name"],
+            "state": place["state"],
+        }
+
+
+class GeoIndex:
+    """Listings in a uniform lat/lon grid with nearest / within-radius queries.
+
+    Rows carrying ``latitude`` / ``longitude`` use them as-is; otherwise
+    their ``location`` text is geocoded with the gazetteer.
+    """
+
+    def __init__(self, gazetteer: Gazetteer | None = None, cell_degrees: float = 0.5):
+        self.gazetteer = gazetteer or Gazetteer()
+        self.cell_degrees = cell_degrees
+        self._lock = threading.RLock()
+        self._reset()
+        self.loaded_at = None
+
+    def _reset(self) -> None:
+        self._rows = []          # slot -> product row, None once removed
+        self._slot_of = {}       # product id -> slot
+        self._geo = []           # slot -> geocode result
+        self._lat = np.zeros(0)
+        self._lon = np.zeros(0)
+        self._category = np.zeros(0, dtype=np.int32)
+        self._categories = {}    # lowercased name -> code
+        self._cells = {}         # (row, col) -> [slot, ...]
+        self._size = 0
+        self._live = 0
+        self.unlocated = 0
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def locate(self, row: dict) -> dict | None:
+        coords = parse_coordinates(row.get("latitude"), row.get("longitude"))
+        if coords is not None:
+            return {"lat": coords[0], "lon": coords[1], "precision": "exact",
+                    "place": row.get("location") or "", "state": ""}
+        return self.gazetteer.geocode(row.get("location"))
+
+    # ---------- updates ----------
+
+    def add_many(self, rows) -> None:
+        with self._lock:
+            for row in rows:
+                self._add(row)
+
+    def _add(self, row: dict) -> None:
+        product_id = row.get("id")
+        if product_id is not None and product_id in self._slot_of:
+            self._remove(product_id)
+        geo = self.locate(row)
+        if geo is None:
+            self.unlocated += 1
+            return
+
+        slot = self._size
+        if slot >= len(self._lat):
+            capacity = max(len(self._lat) * 2, 1024)
+            self._lat = np.resize(self._lat, capacity)
+            self._lon = np.resize(self._lon, capacity)
+            self._category = np.resize(self._category, capacity)
+        self._lat[slot], self._lon[slot] = geo["lat"], geo["lon"]
+        self._category[slot] = self._categories.setdefault(
+            str(row.get("category") or "").casefold(), len(self._categories))
+        self._rows.append(dict(row))
+        self._geo.append(geo)
+        self._cells.setdefault(self._cell(geo["lat"], geo["lon"]), []).append(slot)
+        if product_id is not None:
+            self._slot_of[product_id] = slot
+        self._size += 1
+        self._live += 1
+
+    def patch(self, product_id, fields: dict) -> None:
+        """Update stored fields that don't move the listing (e.g. image URLs)."""
+        with self._lock:
+            slot = self._slot_of.get(product_id)
+            if slot is not None:
+                self._rows[slot] = {**self._rows[slot], **fields}
+
+    def remove(self, product_id) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id) -> None:
+        slot = self._slot_of.pop(product_id, None)
+        if slot is None:
+            return
+        cell = self._cells[self._cell(self._lat[slot], self._lon[slot])]
+        cell.remove(slot)
+        self._rows[slot] = None
+        self._live -= 1
+
+    def replace_all(self, rows) -> None:
+        """Rebuild from scratch off to the side, then swap in."""
+        fresh = GeoIndex(self.gazetteer, self.cell_degrees)
+        fresh.add_many(rows)
+        with self._lock:
+            for name in ("_rows", "_slot_of", "_geo", "_lat", "_lon", "_category", "_categories",
+                         "_cells", "_size", "_live", "unlocated"):
+                setattr(self, name, getattr(fresh, name))
+            self.loaded_at = time.time()
+
+    # ---------- queries ----------
+
+    def _ring(self, center: tuple, r: int) -> list:
+        """Occupied cells exactly ``r`` steps (Chebyshev) from ``center``."""
+        ci, cj = center
+        if r == 0:
+            cells = [center]
+        else:
+            cells = [(ci + di, cj + dj) for di in (-r, r) for dj in range(-r, r + 1)]
+            cells += [(ci + di, cj + dj) for di in range(-r + 1, r) for dj in (-r, r)]
+        return [self._cells[c] for c in cells if self._cells.get(c)]
+
+    def nearby(self, lat: float, lon: float, radius_km: float | None = None, k: int = 20,
+               category: str = "", offset: int = 0) -> dict:
+        """Listings closest to ``(lat, lon)``, nearest first.
+
+        Returns ``k`` results starting at ``offset``, optionally only those
+        within ``radius_km``. Rings of grid cells are visited outwards until
+        nothing unvisited can be closer than the results found so far.
+        """
+        started = time.perf_counter()
+        wanted = offset + k + 1  # one extra tells us whether another page exists
+        with self._lock:
+            code = self._categories.get(category.casefold(), -1) if category else None
+            center = self._cell(lat, lon)
+            # No occupied cell lies beyond this many rings
+            reach = max((max(abs(i - center[0]), abs(j - center[1])) for i, j in self._cells), default=-1)
+            if radius_km is not None:
+                # Rings needed to cover the radius where a degree of longitude is shortest
+                widest = min(abs(lat) + radius_km / KM_PER_DEGREE, 89.0)
+                step_km = self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(widest))
+                reach = min(reach, int(math.ceil(radius_km / step_km)) + 1)
+
+            slots, dist = [], []
+            found = 0
+            for r in range(reach + 1):
+                cells = self._ring(center, r)
+                if cells:
+                    ring = np.concatenate([np.asarray(cell, dtype=np.int64) for cell in cells])
+                    if code is not None:
+                        ring = ring[self._category[ring] == code]
+                    d = haversine_km(lat, lon, self._lat[ring], self._lon[ring])
+                    if radius_km is not None:
+                        keep = d <= radius_km
+                        ring, d = ring[keep], d[keep]
+                    slots.append(ring)
+                    dist.append(d)
+                    found += len(ring)
+
+                # The query point can sit anywhere in its own cell, so every
+                # listing past ring r is at least r cells away
+                if found >= wanted:
+                    widest = min(abs(lat) + (r + 1) * self.cell_degrees, 89.0)
+                    bound = r * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(widest))
+                    kth = np.partition(np.concatenate(dist), wanted - 1)[wanted - 1]
+                    if kth <= bound:
+                        break
+
+            slots = np.concatenate(slots) if slots else np.zeros(0, dtype=np.int64)
+            dist = np.concatenate(dist) if dist else np.zeros(0)
+            if len(dist) > wanted:
+                top = np.argpartition(dist, wanted - 1)[:wanted]
+            else:
+                top = np.arange(len(dist))
+            top = top[np.argsort(dist[top], kind="stable")]
+            has_more = len(top) > offset + k
+            top = top[offset:offset + k]
+            products = [
+                {**self._rows[s], "distance_km": round(float(d), 1), "geo": self._geo[s]}
+                for s, d in zip(slots[top].tolist(), dist[top].tolist())
+            ]
+
+        return {
+            "products": products,
+            "has_more": has_more,
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "located": self._live,
+                "unlocated": self.unlocated,
+                "cells": sum(1 for slots in self._cells.values() if slots),
+                "places": len(self.gazetteer.places),
+                "loaded_at": self.loaded_at,
+            }
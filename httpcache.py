@@ -0,0 +1,205 @@
+from __future__ import annotations
+"""
+Taaza Mandi – HTTP validators and compression
+- Strong ETags from a catalogue version counter (plus user, URL and build),
+  so If-None-Match is answered with 304 before the view touches Supabase
+- gzip / brotli for HTML, JSON and other text responses above a size
+  threshold; each encoding gets its own ETag
+- Compressed bodies cached by ETag, so unchanged pages compress once
+- Bytes in / out / saved and 304 counts via stats()
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import make_response, request
+
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional: gzip only without it
+    brotli = None
+
+COMPRESSIBLE = (
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/csv",
+    "application/json",
+    "application/javascript",
+    "text/javascript",
+    "application/x-ndjson",
+    "image/svg+xml",
+)
+
+
+def tree_fingerprint(path: str) -> str:
+    """Short hash of file names and mtimes under ``path`` (templates, static)."""
+    h = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            try:
+                h.update(f"{full}:{os.stat(full).st_mtime_ns};".encode())
+            except OSError:
+                pass
+    return h.hexdigest()[:12]
+
+
+def _accepts(header: str) -> set:
+    """Encodings an Accept-Encoding header allows (q=0 excluded)."""
+    out = set()
+    for part in (header or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            out.add(name)
+    return out
+
+
+class HttpCache:
+    """Conditional GETs and response compression for the Flask app."""
+
+    def __init__(self, build: str = "", window: float | None = None, min_size: int = 1024,
+                 gzip_level: int = 6, brotli_quality: int = 5, cache_size: int = 256):
+        self.build = build
+        # Other workers' inserts don't bump this process' version; rolling the
+        # tags every ``window`` seconds bounds how long a 304 can be stale
+        self.window = window
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._compressed = TTLCache(maxsize=cache_size, ttl=None, name="compressed")
+        self._sizes = TTLCache(maxsize=4096, ttl=None, name="etag-sizes")  # tag -> body bytes
+        self._lock = threading.Lock()
+        self.version = 0
+        self.not_modified = 0
+        self.tagged = 0
+        self.compressed = {"gzip": 0, "br": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.bytes_skipped = 0
+
+    def bump(self) -> None:
+        """Mark the catalogue as changed; every catalogue ETag changes."""
+        with self._lock:
+            self.version += 1
+
+    def etag(self, *parts) -> str:
+        window = int(time.time() // self.window) if self.window else 0
+        raw = repr((self.build, self.version, window) + parts)
+        return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+    def conditional(self, key_func):
+        """Decorator: answer If-None-Match with 304 without running the view.
+
+        ``key_func()`` returns what (besides the catalogue version) the
+        response depends on, e.g. the user and the query string, or None to
+        skip validation for this request.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                parts = key_func()
+                if parts is None or request.method not in ("GET", "HEAD"):
+                    return view(*args, **kwargs)
+                tag = self.etag(request.path, *parts)
+                variants = [tag] + [f"{tag}-{encoding}" for encoding in ("gzip", "br")]
+                held = next((v for v in variants if request.if_none_match.contains_weak(v)), None)
+                if held is not None:
+                    with self._lock:
+                        self.not_modified += 1
+                        self.bytes_skipped += self._sizes.get(tag, 0)
+                    response = make_response("", 304)
+                    response.set_etag(held)  # the representation the client already has
+                    response.headers["Cache-Control"] = "private, no-cache"
+                    response.vary.add("Accept-Encoding")
+                    return response
+
+                version = self.version
+                response = make_response(view(*args, **kwargs))
+                # If the catalogue changed mid-view, the body may match neither version
+                if response.status_code == 200 and not response.is_streamed and self.version == version:
+                    response.set_etag(tag)
+                    response.headers["Cache-Control"] = "private, no-cache"
+                    self._sizes.set(tag, response.content_length or 0)
+                    with self._lock:
+                        self.tagged += 1
+                return response
+            return wrapper
+        return decorator
+
+    def _choose_encoding(self, accept_encoding: str) -> str | None:
+        accepted = _accepts(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted or "*" in accepted:
+            return "gzip"
+        return None
+
+    def compress(self, response):
+        """``after_request`` hook: compress eligible responses in place."""
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.is_streamed
+            or response.direct_passthrough
+            or request.method == "HEAD"
+            or response.mimetype not in COMPRESSIBLE
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self._choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag and not weak else None
+        data = self._compressed.get(key) if key else None
+        if data is None:
+            if encoding == "br":
+                data = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                data = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            if key:
+                self._compressed.set(key, data)
+        if len(data) >= len(body):
+            return response
+
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            # A strong tag names one exact byte sequence, so each encoding gets its own
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        with self._lock:
+            self.compressed[encoding] += 1
+            self.bytes_in += len(body)
+            self.bytes_out += len(data)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "catalogue_version": self.version,
+                "etag_responses": self.tagged,
+                "not_modified": self.not_modified,
+                "compressed": dict(self.compressed),
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+                "not_modified_bytes_saved": self.bytes_skipped,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+                "brotli": brotli is not None,
+                "min_size": self.min_size,
+            }
@@ -0,0 +1,754 @@
+from __future__ import annotations
+"""
+Taaza Mandi – crop model inference helpers
+- One definition of the predictor's input features and their bounds
+- Row parsing for JSON / CSV batches
+- Vectorised validation and a single predict_proba call per batch
+- Micro-batching worker that coalesces concurrent single-row requests
+- Prediction cache keyed on quantised inputs, flushed when the model changes
+- Lazy, optionally memory-mapped model loading with hot reload on file change
+- FlatForest: a RandomForest flattened into contiguous arrays, scored in NumPy
+"""
+
+import csv
+import io
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zipfile
+from concurrent.futures import Future
+
+import joblib
+import numpy as np
+
+from cache import TTLCache
+from jsonlog import default_logger
+
+# Order matches the columns the model was trained on (N, P, K, humidity, rainfall)
+FEATURES = ("n", "p", "k", "humidity", "rainfall")
+
+FEATURE_BOUNDS = {
+    "n": (0, 200),
+    "p": (0, 150),
+    "k": (0, 200),
+    "humidity": (0, 100),
+    "rainfall": (0, 3000),
+}
+
+# Default quantisation step per feature: whole kg/ha for N/P/K, 1% humidity, 1 mm rain
+DEFAULT_QUANT_STEPS = {
+    "n": 1.0,
+    "p": 1.0,
+    "k": 1.0,
+    "humidity": 1.0,
+    "rainfall": 1.0,
+}
+
+_LOWER = np.array([FEATURE_BOUNDS[f][0] for f in FEATURES], dtype=float)
+_UPPER = np.array([FEATURE_BOUNDS[f][1] for f in FEATURES], dtype=float)
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def rows_from_json(data) -> np.ndarray:
+    """Accept ``{"rows": [...]}`` or a bare list; rows are dicts or 5-item lists."""
+    rows = data.get("rows") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("Expected a non-empty list of rows")
+
+    X = np.empty((len(rows), len(FEATURES)), dtype=float)
+    for i, row in enumerate(rows):
+        if isinstance(row, dict):
+            lowered = {str(k).lower(): v for k, v in row.items()}
+            X[i] = [_to_float(lowered.get(f)) for f in FEATURES]
+        elif isinstance(row, (list, tuple)) and len(row) == len(FEATURES):
+            X[i] = [_to_float(v) for v in row]
+        else:
+            X[i] = np.nan
+    return X
+
+
+def rows_from_csv(text: str) -> np.ndarray:
+    """Parse CSV with a header naming N, P, K, humidity and rainfall (any case)."""
+    reader = csv.reader(io.StringIO(text))
+    header = next(reader, None)
+    if not header:
+        raise ValueError("CSV is empty")
+    columns = {name.strip().lower(): idx for idx, name in enumerate(header)}
+    missing = [f for f in FEATURES if f not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+    idx = [columns[f] for f in FEATURES]
+
+    values = []
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        values.append([_to_float(row[j]) if j < len(row) else float("nan") for j in idx])
+    if not values:
+        raise ValueError("CSV has no data rows")
+    return np.array(values, dtype=float)
+
+
+def validate_rows(X: np.ndarray) -> list:
+    """Return one error message (or None) per row, using the predictor's bounds."""
+    finite = np.isfinite(X)
+    bad = ~finite | (X < _LOWER) | (X > _UPPER)
+    errors = [None] * len(X)
+    for i in np.flatnonzero(bad.any(axis=1)):
+        j = int(np.argmax(bad[i]))
+        name = FEATURES[j]
+        if not finite[i, j]:
+            errors[i] = f"{name} must be a number"
+        else:
+            lo, hi = FEATURE_BOUNDS[name]
+            errors[i] = f"{name} must be between {lo} and {hi}"
+    return errors
+
+
+def predict_batch(model, X: np.ndarray):
+    """Predict every row of ``X`` in one model call.
+
+    Returns ``(labels, confidences)``; confidences are None when the model
+    has no ``predict_proba``.
+    """
+    if len(X) == 0:
+        return [], []
+    if hasattr(model, "predict_proba"):
+        proba = model.predict_proba(X)
+        best = np.argmax(proba, axis=1)
+        labels = np.asarray(model.classes_).take(best)
+        confidences = proba[np.arange(len(X)), best]
+        return [str(label) for label in labels], [float(c) for c in confidences]
+    return [str(label) for label in model.predict(X)], [None] * len(X)
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one model call.
+
+    Requests queue up for a background worker, which flushes a batch when it
+    holds ``max_batch`` rows or ``max_wait`` seconds after the first row in it
+    arrived, whichever comes first. ``get_model`` is called per batch so a
+    reloaded model is picked up without restarting the worker; a row
+    submitted with ``model=`` runs on exactly that model, so callers that key
+    results by model version get results from that version.
+    ``observe(seconds)`` is called with each batch's model time.
+    """
+
+    def __init__(self, get_model, max_batch: int = 64, max_wait: float = 0.005, observe=None):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.get_model = get_model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.observe = observe
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.predict_time_total = 0.0
+
+    def _ensure_worker(self) -> None:
+        # Started lazily so each forked server worker gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="predict-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, row, model=None) -> Future:
+        """Queue one feature row; the future resolves to ``(label, confidence)``."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((np.asarray(row, dtype=float), future, time.perf_counter(), model))
+        return future
+
+    def predict(self, row, model=None, timeout: float | None = 10.0):
+        return self.submit(row, model=model).result(timeout=timeout)
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = first[2] + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch: list) -> None:
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        # One model call per distinct model; only a reload mid-batch makes two
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[3]), (item[3], []))[1].append(item)
+        done = []
+        for model, items in groups.values():
+            try:
+                if model is None:
+                    model = self.get_model()
+                if model is None:
+                    raise RuntimeError("Model not loaded on server")
+                labels, confidences = predict_batch(model, np.vstack([item[0] for item in items]))
+            except Exception as e:
+                for _, future, _, _ in items:
+                    future.set_exception(e)
+                continue
+            for (_, future, _, _), label, confidence in zip(items, labels, confidences):
+                future.set_result((label, confidence))
+            done.extend(items)
+        if not done:
+            return
+        finished = time.perf_counter()
+        if self.observe is not None:
+            self.observe(finished - started)
+
+        batch = done
+        waits = [started - enqueued for _, _, enqueued, _ in batch]
+        with self._stats_lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.queue_wait_total += sum(waits)
+            self.queue_wait_max = max(self.queue_wait_max, max(waits))
+            self.predict_time_total += finished - started
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            batches, rows = self.batches, self.rows
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "rows": rows,
+                "mean_batch_size": round(rows / batches, 2) if batches else 0.0,
+                "mean_occupancy": round(rows / (batches * self.max_batch), 4) if batches else 0.0,
+                "mean_queue_wait_ms": round(self.queue_wait_total / rows * 1000, 3) if rows else 0.0,
+                "max_queue_wait_ms": round(self.queue_wait_max * 1000, 3),
+                "mean_predict_ms": round(self.predict_time_total / batches * 1000, 3) if batches else 0.0,
+            }
+
+
+def parse_quant_steps(spec: str | None) -> dict:
+    """Parse ``"n=1,p=1,humidity=0.5"`` over the defaults; raises ValueError."""
+    steps = dict(DEFAULT_QUANT_STEPS)
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip().lower()
+        if name not in steps:
+            raise ValueError(f"Unknown feature in quantisation spec: {name}")
+        step = float(value)
+        if step <= 0:
+            raise ValueError(f"Quantisation step for {name} must be positive")
+        steps[name] = step
+    return steps
+
+
+class PredictionCache:
+    """Memoise predictions for inputs that fall in the same quantisation cell.
+
+    The model is always run on the cell's representative point (the rounded
+    inputs), so a cached answer does not depend on which request filled it.
+    Entries are tagged with the model version and the whole cache is flushed
+    the first time a different version is seen.
+    """
+
+    def __init__(self, steps: dict | None = None, maxsize: int = 4096):
+        steps = steps or DEFAULT_QUANT_STEPS
+        self.steps = np.array([steps[f] for f in FEATURES], dtype=float)
+        self._cache = TTLCache(maxsize=maxsize, ttl=None, name="predictions")
+        self._model_version = None
+        self._lock = threading.Lock()
+        self.flushes = 0
+
+    def quantize(self, row) -> tuple:
+        cells = np.round(np.asarray(row, dtype=float) / self.steps)
+        return tuple(int(c) for c in cells)
+
+    def representative(self, cell: tuple) -> list:
+        return [float(v) for v in np.asarray(cell, dtype=float) * self.steps]
+
+    def get_or_predict(self, row, model_version, predict):
+        """Return the cached result for ``row`` or call ``predict(representative_row)``."""
+        if model_version != self._model_version:
+            with self._lock:
+                if model_version != self._model_version:
+                    self._cache.clear()
+                    self._model_version = model_version
+                    self.flushes += 1
+        cell = self.quantize(row)
+        return self._cache.get_or_load(
+            (model_version, cell), lambda: predict(self.representative(cell))
+        )
+
+    def stats(self) -> dict:
+        return {
+            **self._cache.stats(),
+            "steps": dict(zip(FEATURES, self.steps.tolist())),
+            "model_flushes": self.flushes,
+        }
+
+
+# Compact artifact format: header + narrowest lossless dtypes
+FOREST_FORMAT = "taaza-mandi-forest"
+FOREST_FORMAT_VERSION = 2
+# Version 1 had no header: per-node ``value`` rows and a ``max_depth`` array
+_V1_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots", "classes", "max_depth")
+
+
+def _float32_floor(values: np.ndarray) -> np.ndarray:
+    """Largest float32 <= each value.
+
+    Inputs are compared as float32, so ``x <= t`` and ``x <= floor32(t)``
+    agree for every possible input: thresholds shrink to float32 losslessly.
+    """
+    narrowed = values.astype(np.float32)
+    over = narrowed.astype(np.float64) > values
+    narrowed[over] = np.nextafter(narrowed[over], np.float32(-np.inf))
+    return narrowed
+
+
+def _index_dtype(max_index: int, signed: bool = True):
+    for dtype in ((np.int8, np.int16, np.int32) if signed else (np.uint8, np.uint16, np.uint32)):
+        if max_index <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _mmap_npz(path: str, mmap_mode: str) -> dict:
+    """Memory-map every array in an uncompressed ``.npz``.
+
+    ``np.load`` ignores ``mmap_mode`` for archives, but members written by
+    ``np.savez`` are stored as-is, so each one is a plain ``.npy`` at a
+    fixed offset in the file and can be mapped in place.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed; cannot memory-map {info.filename}")
+            # The local header repeats the name and may carry its own extra field
+            f.seek(info.header_offset)
+            local = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", local[26:30])
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{path} holds object arrays; cannot memory-map {info.filename}")
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return arrays
+
+
+class FlatForest:
+    """A fitted RandomForestClassifier flattened into contiguous node arrays.
+
+    All trees share one set of arrays; ``roots`` holds each tree's first node
+    and leaves have ``left == -1``. Leaf class fractions are deduplicated into
+    ``value`` and referenced per node through ``value_index``. Prediction
+    walks every tree for every row at once, one tree level per step, and
+    accumulates leaf probabilities tree by tree in the same order and dtype
+    as scikit-learn, so an unpruned forest's ``predict_proba`` is
+    bit-identical to the source model.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, value_index, roots,
+                 classes, max_depth, features=FEATURES):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.value_index = value_index
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.features = tuple(features)
+        self.n_features_in_ = len(self.features)
+        # Traversal views: leaves point at themselves and read feature 0, so
+        # a step never needs a leaf/internal branch
+        self._is_leaf = left == -1
+        own = np.arange(len(left), dtype=np.intp)
+        self._next_left = np.where(self._is_leaf, own, left).astype(np.intp)
+        self._next_right = np.where(self._is_leaf, own, right).astype(np.intp)
+        self._split_feature = np.where(self._is_leaf, 0, feature).astype(np.intp)
+        self._leaf_value = value_index.astype(np.intp)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_sklearn(cls, forest) -> "FlatForest":
+        trees = [est.tree_ for est in forest.estimators_]
+        n_classes = len(forest.classes_)
+        offsets = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+
+        def shift(children, offset):
+            return np.where(children == -1, -1, children + offset)
+
+        left = np.concatenate([shift(t.children_left, o) for t, o in zip(trees, offsets)])
+        # tree_.value already holds per-node class fractions (what
+        # DecisionTreeClassifier.predict_proba returns for a leaf)
+        node_value = np.concatenate([t.value[:, 0, :n_classes] for t in trees]).astype(np.float64)
+        leaf = left == -1
+        value, leaf_index = np.unique(node_value[leaf], axis=0, return_inverse=True)
+        value_index = np.zeros(len(left), dtype=np.intp)
+        value_index[leaf] = leaf_index.ravel()
+
+        flat = cls(
+            feature=np.concatenate([t.feature for t in trees]),
+            threshold=_float32_floor(np.concatenate([t.threshold for t in trees])),
+            left=left,
+            right=np.concatenate([shift(t.children_right, o) for t, o in zip(trees, offsets)]),
+            value=value,
+            value_index=value_index,
+            roots=offsets,
+            classes=np.asarray(forest.classes_),
+            max_depth=max(t.max_depth for t in trees),
+        )
+        return flat._collapse_redundant_splits()._rebuild(range(flat.n_trees))
+
+    def _collapse_redundant_splits(self) -> "FlatForest":
+        """Turn splits whose two leaves carry identical values into leaves.
+
+        Lossless; repeated until no such split remains. Orphaned nodes are
+        dropped by the next ``_rebuild``.
+        """
+        feature, left, right = self.feature.copy(), self.left.copy(), self.right.copy()
+        value_index = self.value_index.copy()
+        while True:
+            leaf = left == -1
+            l, r = np.where(leaf, 0, left), np.where(leaf, 0, right)
+            redundant = ~leaf & leaf[l] & leaf[r] & (value_index[l] == value_index[r])
+            if not redundant.any():
+                break
+            value_index[redundant] = value_index[l[redundant]]
+            left[redundant] = right[redundant] = -1
+            feature[redundant] = -2
+        return FlatForest(feature, self.threshold, left, right, self.value, value_index,
+                          self.roots, self.classes_, self.max_depth, self.features)
+
+    def _rebuild(self, tree_ids) -> "FlatForest":
+        """Copy the given trees' reachable nodes into fresh, compact arrays."""
+        order, roots, max_depth = [], [], 0
+        for tid in tree_ids:
+            roots.append(len(order))
+            stack = [(int(self.roots[tid]), 0)]
+            while stack:
+                node, depth = stack.pop()
+                order.append(node)
+                max_depth = max(max_depth, depth)
+                if self.left[node] != -1:
+                    stack.append((int(self.right[node]), depth + 1))
+                    stack.append((int(self.left[node]), depth + 1))
+        order = np.asarray(order, dtype=np.intp)
+        renumber = np.full(len(self.left), -1, dtype=np.intp)
+        renumber[order] = np.arange(len(order))
+        left, right = self.left[order], self.right[order]
+        is_leaf = left == -1
+
+        used, value_index = np.unique(self.value_index[order][is_leaf], return_inverse=True)
+        new_value_index = np.zeros(len(order), dtype=np.intp)
+        new_value_index[is_leaf] = value_index.ravel()
+
+        return FlatForest(
+            feature=np.where(is_leaf, -2, self.feature[order]),
+            threshold=np.where(is_leaf, np.float32(-2), self.threshold[order]).astype(self.threshold.dtype),
+            left=np.where(is_leaf, -1, renumber[np.where(is_leaf, 0, left)]),
+            right=np.where(is_leaf, -1, renumber[np.where(is_leaf, 0, right)]),
+            value=self.value[used],
+            value_index=new_value_index,
+            roots=np.asarray(roots, dtype=np.intp),
+            classes=self.classes_,
+            max_depth=max_depth,
+            features=self.features,
+        )
+
+    def prune_trees(self, X, y, tolerance: float) -> "FlatForest":
+        """Greedily drop trees while accuracy on ``(X, y)`` stays within ``tolerance``.
+
+        Each step removes the tree whose absence costs the least accuracy.
+        The pruned forest is no longer bit-identical to the source model.
+        """
+        per_tree = self.value[self._leaf_value[self.apply(X)]]  # (rows, trees, classes)
+        total = per_tree.sum(axis=1)
+        y = np.asarray(y)
+
+        def accuracy(votes):
+            return float(np.mean(self.classes_.take(np.argmax(votes, axis=1)) == y))
+
+        target = accuracy(total) - tolerance
+        keep = list(range(self.n_trees))
+        while len(keep) > 1:
+            scores = [(accuracy(total - per_tree[:, t]), t) for t in keep]
+            best_score, best_tree = max(scores, key=lambda s: (s[0], -s[1]))
+            if best_score < target:
+                break
+            total -= per_tree[:, best_tree]
+            keep.remove(best_tree)
+        return self._rebuild(sorted(keep))
+
+    def header(self) -> dict:
+        return {
+            "format": FOREST_FORMAT,
+            "version": FOREST_FORMAT_VERSION,
+            "features": list(self.features),
+            "n_classes": len(self.classes_),
+            "n_trees": self.n_trees,
+            "n_nodes": len(self.left),
+            "max_depth": self.max_depth,
+        }
+
+    def save(self, path: str) -> None:
+        n_nodes = len(self.left)
+        node_dtype = _index_dtype(n_nodes)
+        # Uncompressed so loading is a straight read (or a memory map) of each array
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                header=np.array(json.dumps(self.header())),
+                feature=self.feature.astype(_index_dtype(self.n_features_in_)),
+                threshold=_float32_floor(self.threshold.astype(np.float64)),
+                left=self.left.astype(node_dtype),
+                right=self.right.astype(node_dtype),
+                value=self.value,
+                value_index=self.value_index.astype(_index_dtype(len(self.value), signed=False)),
+                roots=self.roots.astype(node_dtype),
+                classes=self.classes_.astype(str),
+            )
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str | None = None) -> "FlatForest":
+        """Read a ``save``d forest; with ``mmap_mode`` the arrays map the file."""
+        if mmap_mode:
+            return cls._from_arrays(path, _mmap_npz(path, mmap_mode))
+        with np.load(path, allow_pickle=False) as data:
+            return cls._from_arrays(path, {name: data[name] for name in data.files})
+
+    @classmethod
+    def _from_arrays(cls, path: str, data: dict) -> "FlatForest":
+        if "header" not in data:
+            if not all(name in data for name in _V1_ARRAYS):
+                raise ValueError(f"{path} is not a {FOREST_FORMAT} file")
+            return cls(
+                feature=data["feature"],
+                threshold=data["threshold"],
+                left=data["left"],
+                right=data["right"],
+                value=data["value"],
+                value_index=np.arange(len(data["left"]), dtype=np.intp),
+                roots=data["roots"],
+                classes=data["classes"],
+                max_depth=data["max_depth"],
+            )
+        header = json.loads(str(data["header"]))
+        if header.get("format") != FOREST_FORMAT:
+            raise ValueError(f"{path} is not a {FOREST_FORMAT} file")
+        if header.get("version", 0) > FOREST_FORMAT_VERSION:
+            raise ValueError(
+                f"{path} uses format version {header['version']}; "
+                f"this build reads up to {FOREST_FORMAT_VERSION}"
+            )
+        if tuple(header.get("features", ())) != FEATURES:
+            raise ValueError(f"{path} was trained on features {header.get('features')}, expected {list(FEATURES)}")
+        return cls(
+            feature=data["feature"],
+            threshold=data["threshold"],
+            left=data["left"],
+            right=data["right"],
+            value=data["value"],
+            value_index=data["value_index"],
+            roots=data["roots"],
+            classes=data["classes"],
+            max_depth=header["max_depth"],
+            features=header["features"],
+        )
+
+    def apply(self, X) -> np.ndarray:
+        """Leaf index reached in each tree, shape ``(n_rows, n_trees)``."""
+        # scikit-learn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        n_rows, n_trees = len(X), len(self.roots)
+        flat_x = X.ravel()
+        # One slot per (row, tree); only slots still at an internal node move
+        node = np.tile(self.roots.astype(np.intp), n_rows)
+        row_base = np.repeat(np.arange(n_rows, dtype=np.intp) * X.shape[1], n_trees)
+        active = np.flatnonzero(~self._is_leaf[node])
+        for _ in range(self.max_depth):
+            if not len(active):
+                break
+            current = node[active]
+            go_left = flat_x[row_base[active] + self._split_feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self._next_left[current], self._next_right[current])
+            node[active] = current
+            active = active[~self._is_leaf[current]]
+        return node.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        for t in range(leaves.shape[1]):
+            proba += self.value[self._leaf_value[leaves[:, t]]]
+        proba /= leaves.shape[1]
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def load_model(path: str, mmap_mode: str | None = None):
+    """Load a FlatForest ``.npz`` export or a joblib pickle, by extension.
+
+    ``mmap_mode`` maps the stored arrays of either format from the page
+    cache, so worker processes share them.
+    """
+    if path.endswith(".npz"):
+        return FlatForest.load(path, mmap_mode=mmap_mode)
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def _rss_bytes() -> int | None:
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ModelLoader:
+    """Load the model on first use and swap in a new one when the file changes.
+
+    ``mmap_mode`` is passed to ``joblib.load`` so the numpy arrays in an
+    uncompressed dump are mapped from the page cache and shared between
+    worker processes instead of copied into each. The file is re-checked at
+    most every ``check_interval`` seconds; a failed reload keeps serving the
+    previous model and is not retried until the file changes again. Loads and failures are logged as ``model.loaded`` /
+    ``model.load_failed`` events.
+    """
+
+    def __init__(self, path: str, mmap_mode: str | None = None, check_interval: float = 2.0,
+                 log=None):
+        self.path = path
+        self.log = log or default_logger()
+        self.mmap_mode = mmap_mode
+        self.check_interval = check_interval
+        self._current = (None, None)  # (model, version) swapped as one reference
+        self._failed_version = None  # size/mtime of the file that last failed to load
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self.loads = 0
+        self.failures = 0
+        self.last_error = None
+        self.load_time = None
+        self.loaded_at = None
+        self.rss_delta = None
+
+    def _file_version(self) -> str | None:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return f"{self.path}:{st.st_size}:{st.st_mtime_ns}"
+
+    def _load(self, version: str) -> None:
+        """Load ``version`` and publish it. Caller must hold the lock."""
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        try:
+            model = load_model(self.path, mmap_mode=self.mmap_mode)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self._failed_version = version
+            self.log.warning("model.load_failed", path=self.path, error=str(e))
+            return
+        self.load_time = time.perf_counter() - started
+        rss_after = _rss_bytes()
+        self.rss_delta = rss_after - rss_before if rss_before and rss_after else None
+        self.loaded_at = time.time()
+        self.loads += 1
+        self.last_error = None
+        self._failed_version = None
+        self._current = (model, version)
+        self.log.info(
+            "model.loaded",
+            path=self.path,
+            version=version,
+            load_ms=round(self.load_time * 1000, 1),
+            mmap_mode=self.mmap_mode,
+        )
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            version = self._file_version()
+            if version is None:
+                if self._current[0] is None:
+                    self.last_error = f"Model file not found: {self.path}"
+                return
+            if version != self._current[1] and version != self._failed_version:
+                self._load(version)
+
+    def current(self) -> tuple:
+        """Return ``(model, version)`` as one consistent pair."""
+        self._refresh()
+        return self._current
+
+    def get(self):
+        return self.current()[0]
+
+    def stats(self) -> dict:
+        model, version = self._current
+        return {
+            "path": self.path,
+            "loaded": model is not None,
+            "version": version,
+            "mmap_mode": self.mmap_mode,
+            "loads": self.loads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "load_time_ms": round(self.load_time * 1000, 2) if self.load_time is not None else None,
+            "loaded_at": self.loaded_at,
+            "rss_delta_bytes": self.rss_delta,
+            "process_rss_bytes": _rss_bytes(),
+        }
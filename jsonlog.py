@@ -0,0 +1,172 @@
+from __future__ import annotations
+"""
+Taaza Mandi – non-blocking structured logging
+- log.info("login.success", email=...) only builds a dict and puts it on a
+  bounded queue; a background thread encodes JSON lines and writes them
+- When the queue is full the event is dropped and counted, never waited on
+- Per-event sampling for high-volume events (written lines carry the rate)
+- The current request id (set per request by the app) is added to every event
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+# Set by the app for the duration of each request
+request_id: ContextVar = ContextVar("request_id", default=None)
+
+LEVELS = ("debug", "info", "warning", "error")
+
+
+def parse_sample_rates(spec: str | None) -> dict:
+    """Parse ``"login.attempt=0.1,signup.attempt=0.5"`` into ``{event: rate}``."""
+    rates = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        event, _, value = part.partition("=")
+        rate = float(value)
+        if not 0 <= rate <= 1:
+            raise ValueError(f"Sample rate for {event.strip()} must be between 0 and 1")
+        rates[event.strip()] = rate
+    return rates
+
+
+class JsonLogger:
+    """Queue-backed JSON-lines logger with a single writer thread."""
+
+    def __init__(self, stream=None, capacity: int = 10000, sample_rates: dict | None = None,
+                 min_level: str = "info", batch: int = 256, **static):
+        self.stream = stream
+        self.capacity = capacity
+        self.sample_rates = dict(sample_rates or {})
+        self.min_level = LEVELS.index(min_level)
+        self.batch = batch
+        self.static = static  # fields added to every line, e.g. service="taaza-mandi"
+        self._queue: queue.Queue = queue.Queue(maxsize=capacity)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.written = 0
+        self.write_errors = 0
+        self.dropped = Counter()
+        self.sampled_out = Counter()
+        atexit.register(self.flush)
+
+    def _ensure_writer(self) -> None:
+        # Started lazily so each forked server worker gets its own thread
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="json-log", daemon=True)
+                self._thread.start()
+
+    def log(self, level: str, event: str, **fields) -> None:
+        if LEVELS.index(level) < self.min_level:
+            return
+        rate = self.sample_rates.get(event)
+        if rate is not None and rate < 1:
+            if random.random() >= rate:
+                with self._stats_lock:
+                    self.sampled_out[event] += 1
+                return
+            fields["sample_rate"] = rate
+        rid = request_id.get()
+        if rid is not None:
+            fields["request_id"] = rid
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((time.time(), level, event, fields))
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped[event] += 1
+
+    def debug(self, event: str, **fields) -> None:
+        self.log("debug", event, **fields)
+
+    def info(self, event: str, **fields) -> None:
+        self.log("info", event, **fields)
+
+    def warning(self, event: str, **fields) -> None:
+        self.log("warning", event, **fields)
+
+    def error(self, event: str, **fields) -> None:
+        self.log("error", event, **fields)
+
+    def _encode(self, item) -> str:
+        ts, level, event, fields = item
+        record = {
+            "ts": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": level,
+            "event": event,
+            **self.static,
+            **fields,
+        }
+        return json.dumps(record, default=str, ensure_ascii=True)
+
+    def _run(self) -> None:
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                stream = self.stream or sys.stdout
+                stream.write("".join(self._encode(item) + "\n" for item in items))
+                stream.flush()
+                with self._stats_lock:
+                    self.written += len(items)
+            except Exception:
+                with self._stats_lock:
+                    self.write_errors += len(items)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """Wait (up to ``timeout``) for queued events to be written."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if self._thread is None or not self._thread.is_alive() or time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "capacity": self.capacity,
+                "written": self.written,
+                "write_errors": self.write_errors,
+                "dropped": sum(self.dropped.values()),
+                "dropped_by_event": dict(self.dropped),
+                "sampled_out": dict(self.sampled_out),
+                "sample_rates": dict(self.sample_rates),
+                "pid": os.getpid(),
+            }
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_logger() -> JsonLogger:
+    """Shared stdout logger for components constructed without one."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = JsonLogger()
+    return _default
@@ -0,0 +1,474 @@
+from __future__ import annotations
+"""
+Taaza Mandi – e-NAM mandi price ingestion
+- Pluggable record source (data.gov.in by default, any compatible URL for tests)
+- Pages through the whole date window instead of one capped request
+- Compact columnar store: dictionary-encoded names, int32 days, float32 prices
+- Vectorised aggregates by commodity, state and market, cached per filter set
+- Daily / weekly / monthly price series rebuilt whenever the store changes
+
+Run ``python mandi.py`` (e.g. from cron) to refresh the store once.
+"""
+
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from cache import TTLCache
+from jsonlog import default_logger
+from timeseries import SeriesStore
+
+ENAM_RESOURCE_ID = "9ef84268-d588-465f-a308-a306f897cc66"
+DEFAULT_BASE_URL = "https://api.data.gov.in/resource"
+# Public data.gov.in sample key the market pages have always used
+DEFAULT_API_KEY = "579b464db66ec23bdd000001776fdbde97c3454a6f5aee2052b6107e"
+
+EPOCH = date(1970, 1, 1)
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+NAME_COLUMNS = ("state", "market", "commodity")
+VALUE_COLUMNS = ("min_price", "modal_price", "max_price", "arrivals", "traded")
+
+
+def _parse_number(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER.search(str(value or "").replace(",", ""))
+    return float(match.group()) if match else float("nan")
+
+
+def _parse_day(value) -> int | None:
+    """Days since epoch for ``dd/mm/yyyy`` or ``yyyy-mm-dd``; None if unparseable."""
+    text = str(value or "").strip()[:10]
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return (datetime.strptime(text, fmt).date() - EPOCH).days
+        except ValueError:
+            continue
+    return None
+
+
+def day_to_iso(day: int) -> str:
+    return (EPOCH + timedelta(days=int(day))).isoformat()
+
+
+def iso_to_day(text: str) -> int:
+    day = _parse_day(text)
+    if day is None:
+        raise ValueError(f"Invalid date: {text}. Use YYYY-MM-DD")
+    return day
+
+
+class DataGovSource:
+    """Reads the e-NAM daily price resource page by page.
+
+    ``base_url`` can point at any server speaking the same query/response
+    shape, e.g. a local fixture server in tests.
+    """
+
+    def __init__(self, api_key: str, base_url: str = DEFAULT_BASE_URL,
+                 resource_id: str = ENAM_RESOURCE_ID, page_size: int = 1000,
+                 timeout: float = 30.0, exclude_commodities=("Rice", "Wheat")):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.resource_id = resource_id
+        self.page_size = page_size
+        self.timeout = timeout
+        self.exclude_commodities = tuple(exclude_commodities)
+
+    def fetch_page(self, offset: int, date_from: str, date_to: str) -> tuple:
+        """Return ``(records, total)``; ``total`` is None if the server omits it."""
+        params = [
+            ("api-key", self.api_key),
+            ("format", "json"),
+            ("offset", offset),
+            ("limit", self.page_size),
+            ("filters[arrival_date][ge]", date_from),
+            ("filters[arrival_date][le]", date_to),
+        ] + [("filters[commodity][ne]", c) for c in self.exclude_commodities]
+        url = f"{self.base_url}/{self.resource_id}?{urllib.parse.urlencode(params)}"
+        with urllib.request.urlopen(url, timeout=self.timeout) as resp:
+            data = json.load(resp)
+        total = data.get("total")
+        return data.get("records") or [], int(total) if total is not None else None
+
+
+class MandiStore:
+    """Column arrays for every ingested price record."""
+
+    def __init__(self, columns: dict, vocab: dict, fetched_at: float):
+        self.columns = columns  # name -> ndarray, all the same length
+        self.vocab = vocab      # name column -> ndarray of strings, indexed by code
+        self.fetched_at = fetched_at
+
+    def __len__(self) -> int:
+        return len(self.columns["day"])
+
+    @classmethod
+    def from_records(cls, records, fetched_at: float | None = None) -> "MandiStore":
+        codes = {name: {} for name in NAME_COLUMNS}
+        cols = {name: [] for name in NAME_COLUMNS + VALUE_COLUMNS + ("day",)}
+        for record in records:
+            rec = {str(k).lower(): v for k, v in record.items()}
+            day = _parse_day(rec.get("arrival_date"))
+            if day is None:
+                continue
+            cols["day"].append(day)
+            for name in NAME_COLUMNS:
+                label = str(rec.get(name) or "Unknown").strip()
+                cols[name].append(codes[name].setdefault(label, len(codes[name])))
+            for name in VALUE_COLUMNS:
+                raw = rec.get(name)
+                if raw is None and name == "arrivals":
+                    raw = rec.get("arrival")
+                cols[name].append(_parse_number(raw))
+
+        columns = {"day": np.asarray(cols["day"], dtype=np.int32)}
+        for name in NAME_COLUMNS:
+            columns[name] = np.asarray(cols[name], dtype=np.int32)
+        for name in VALUE_COLUMNS:
+            columns[name] = np.asarray(cols[name], dtype=np.float32)
+        vocab = {name: np.asarray(list(codes[name]), dtype=str) for name in NAME_COLUMNS}
+        return cls(columns, vocab, fetched_at or time.time())
+
+    def save(self, path: str) -> None:
+        """Write atomically so readers never see a half-written store."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                fetched_at=np.array(self.fetched_at),
+                **self.columns,
+                **{f"vocab_{name}": values for name, values in self.vocab.items()},
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "MandiStore":
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[name] for name in ("day",) + NAME_COLUMNS + VALUE_COLUMNS}
+            vocab = {name: data[f"vocab_{name}"] for name in NAME_COLUMNS}
+            return cls(columns, vocab, float(data["fetched_at"]))
+
+    def _code(self, column: str, label: str | None) -> int | None:
+        if not label:
+            return None
+        hits = np.flatnonzero(self.vocab[column] == label)
+        return int(hits[0]) if len(hits) else -1
+
+    def mask(self, commodity=None, state=None, market=None, day_from=None, day_to=None) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        for column, label in (("commodity", commodity), ("state", state), ("market", market)):
+            code = self._code(column, label)
+            if code is not None:
+                mask &= self.columns[column] == code
+        if day_from is not None:
+            mask &= self.columns["day"] >= day_from
+        if day_to is not None:
+            mask &= self.columns["day"] <= day_to
+        return mask
+
+    @staticmethod
+    def _group(sel: dict, keys: np.ndarray, n_groups: int) -> dict:
+        """Per-group counts, sums and extremes over selected rows, NaNs skipped."""
+        out = {"records": np.bincount(keys, minlength=n_groups)}
+        for name in ("modal_price", "arrivals", "traded"):
+            values = sel[name].astype(np.float64)
+            present = ~np.isnan(values)
+            out[f"{name}_sum"] = np.bincount(keys[present], weights=values[present], minlength=n_groups)
+            out[f"{name}_n"] = np.bincount(keys[present], minlength=n_groups)
+        for name, reduce, fill in (("min_price", np.fmin, np.inf), ("max_price", np.fmax, -np.inf)):
+            acc = np.full(n_groups, fill)
+            reduce.at(acc, keys, sel[name].astype(np.float64))
+            out[name] = acc
+        return out
+
+    @staticmethod
+    def _avg(total, n):
+        return round(float(total / n), 2) if n else None
+
+    @staticmethod
+    def _finite(value):
+        return round(float(value), 2) if np.isfinite(value) else None
+
+    def summary(self, commodity=None, state=None, market=None, day_from=None,
+                day_to=None, rows: int = 200) -> dict:
+        idx = np.flatnonzero(self.mask(commodity, state, market, day_from, day_to))
+        sel = {name: values[idx] for name, values in self.columns.items()}
+        n_commodity = len(self.vocab["commodity"])
+        n_state = len(self.vocab["state"])
+        width = max(len(self.vocab["market"]), 1)
+
+        # Markets are (state, market) pairs: one name can exist in two states
+        pair_codes, pair = np.unique(sel["state"].astype(np.int64) * width + sel["market"], return_inverse=True)
+        pair = pair.ravel()
+        n_pairs = max(len(pair_codes), 1)
+
+        def markets_per(keys, n_groups):
+            combos = np.unique(keys.astype(np.int64) * n_pairs + pair)
+            return np.bincount(combos // n_pairs, minlength=n_groups)
+
+        def table(groups, label, markets=None):
+            out = []
+            for g in np.flatnonzero(groups["records"]):
+                row = label(g)
+                row.update({
+                    "records": int(groups["records"][g]),
+                    "avg_modal_price": self._avg(groups["modal_price_sum"][g], groups["modal_price_n"][g]),
+                    "min_price": self._finite(groups["min_price"][g]),
+                    "max_price": self._finite(groups["max_price"][g]),
+                    "arrivals": round(float(groups["arrivals_sum"][g]), 2),
+                    "traded": round(float(groups["traded_sum"][g]), 2),
+                })
+                if markets is not None:
+                    row["markets"] = int(markets[g])
+                out.append(row)
+            return sorted(out, key=lambda r: -r["records"])
+
+        modal = sel["modal_price"].astype(np.float64)
+        latest = idx[np.argsort(-sel["day"], kind="stable")[:rows]]
+
+        return {
+            "fetched_at": self.fetched_at,
+            "records": int(len(idx)),
+            "overview": {
+                "commodities": int(len(np.unique(sel["commodity"]))),
+                "markets": int(len(pair_codes)),
+                "avg_modal_price": self._avg(np.nansum(modal), np.count_nonzero(~np.isnan(modal))),
+                "total_arrivals": round(float(np.nansum(sel["arrivals"].astype(np.float64))), 2),
+                "first_date": day_to_iso(sel["day"].min()) if len(idx) else None,
+                "last_date": day_to_iso(sel["day"].max()) if len(idx) else None,
+            },
+            "by_commodity": table(
+                self._group(sel, sel["commodity"], n_commodity),
+                lambda g: {"commodity": str(self.vocab["commodity"][g])},
+                markets_per(sel["commodity"], n_commodity),
+            ),
+            "by_state": table(
+                self._group(sel, sel["state"], n_state),
+                lambda g: {"state": str(self.vocab["state"][g])},
+                markets_per(sel["state"], n_state),
+            ),
+            "by_market": table(
+                self._group(sel, pair, len(pair_codes)),
+                lambda g: {
+                    "state": str(self.vocab["state"][pair_codes[g] // width]),
+                    "market": str(self.vocab["market"][pair_codes[g] % width]),
+                },
+            ),
+            "rows": [self.row(i) for i in latest],
+        }
+
+    def row(self, i: int) -> dict:
+        """One record in the shape the market pages render."""
+        c, v = self.columns, self.vocab
+
+        def num(name):
+            value = c[name][i]
+            return None if np.isnan(value) else round(float(value), 2)
+
+        return {
+            "State": str(v["state"][c["state"][i]]),
+            "Market": str(v["market"][c["market"][i]]),
+            "Commodity": str(v["commodity"][c["commodity"][i]]),
+            "Min_Price": num("min_price"),
+            "Modal_Price": num("modal_price"),
+            "Max_Price": num("max_price"),
+            "Arrivals": num("arrivals"),
+            "Traded": num("traded"),
+            "Unit": "Qtl",
+            "Arrival_Date": day_to_iso(c["day"][i]),
+        }
+
+
+def ingest(source, days: int = 30, today: date | None = None, max_pages: int = 10000) -> MandiStore:
+    """Page through the last ``days`` days from ``source`` into a MandiStore."""
+    today = today or date.today()
+    date_from = (today - timedelta(days=days)).isoformat()
+    date_to = today.isoformat()
+    records, offset = [], 0
+    for _ in range(max_pages):
+        page, total = source.fetch_page(offset, date_from, date_to)
+        records.extend(page)
+        offset += len(page)
+        if len(page) < source.page_size or (total is not None and offset >= total):
+            break
+    return MandiStore.from_records(records)
+
+
+class MandiService:
+    """Serves aggregates from the on-disk store and keeps it fresh.
+
+    Every worker reads the same store file and reloads it when it changes.
+    A stale or missing store triggers one background refresh; an exclusive
+    lock file keeps concurrent workers from ingesting at the same time. After
+    a failed ingest no refresh starts for ``retry_interval`` seconds, doubling
+    with each further failure up to ``max_retry_interval``. Ingests and
+    failures are logged as ``mandi.*`` events.
+    """
+
+    def __init__(self, store_path: str, source_factory, days: int = 30,
+                 refresh_interval: float = 3600.0, check_interval: float = 5.0,
+                 retry_interval: float = 60.0, max_retry_interval: float = 3600.0, log=None):
+        self.store_path = store_path
+        self.log = log or default_logger()
+        self.source_factory = source_factory
+        self.days = days
+        self.refresh_interval = refresh_interval
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._store = None
+        self._series = None
+        self._store_mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = threading.Event()
+        self._summaries = TTLCache(maxsize=256, ttl=None, name="mandi_summary")
+        self.refreshes = 0
+        self.last_refresh_error = None
+        self.last_refresh_seconds = None
+        self.consecutive_failures = 0
+        self.last_failure_at = None
+        self._retry_at = 0.0  # monotonic; no refresh starts before this
+
+    def store(self) -> MandiStore | None:
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._next_check = now + self.check_interval
+                    self._reload_if_changed()
+        return self._store
+
+    def _reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.store_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._store_mtime:
+            return
+        try:
+            store = MandiStore.load(self.store_path)
+            self._series = SeriesStore.from_mandi(store)
+            self._store = store
+            self._store_mtime = mtime
+            self._summaries.clear()
+        except Exception as e:
+            self.log.warning("mandi.store_load_failed", path=self.store_path, error=str(e))
+
+    def ensure_fresh(self) -> None:
+        """Start a background refresh if the store is missing or stale."""
+        store = self.store()
+        if store is not None and time.time() - store.fetched_at < self.refresh_interval:
+            return
+        if self._refreshing.is_set() or time.monotonic() < self._retry_at:
+            return
+        self._refreshing.set()
+        threading.Thread(target=self._refresh_in_background, name="mandi-ingest", daemon=True).start()
+
+    def _refresh_in_background(self) -> None:
+        try:
+            if not self.refresh():
+                # Another worker holds the ingest lock; look again after it has had a chance
+                self._retry_at = time.monotonic() + self.check_interval
+        except Exception as e:
+            self.consecutive_failures += 1
+            self.last_failure_at = time.time()
+            delay = min(self.retry_interval * 2 ** (self.consecutive_failures - 1), self.max_retry_interval)
+            self._retry_at = time.monotonic() + delay
+            self.log.warning(
+                "mandi.refresh_failed",
+                consecutive_failures=self.consecutive_failures,
+                retry_in_seconds=delay,
+                error=str(e),
+            )
+        else:
+            self.consecutive_failures = 0
+        finally:
+            self._refreshing.clear()
+
+    def refresh(self) -> bool:
+        """Ingest now unless another process already is; returns True if it ran."""
+        os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+        with open(f"{self.store_path}.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+            started = time.perf_counter()
+            try:
+                store = ingest(self.source_factory(), days=self.days)
+            except Exception as e:
+                self.last_refresh_error = str(e)
+                raise
+            store.save(self.store_path)
+            self.last_refresh_seconds = time.perf_counter() - started
+            self.last_refresh_error = None
+            self.refreshes += 1
+            self.log.info("mandi.ingested", records=len(store), seconds=round(self.last_refresh_seconds, 1))
+        self._next_check = 0.0
+        self.store()
+        return True
+
+    def summary(self, **filters) -> dict | None:
+        store = self.store()
+        if store is None:
+            return None
+        key = (self._store_mtime, json.dumps(filters, sort_keys=True))
+        return self._summaries.get_or_load(key, lambda: {
+            **store.summary(**filters),
+            "commodities": sorted(str(v) for v in store.vocab["commodity"]),
+            "states": sorted(str(v) for v in store.vocab["state"]),
+        })
+
+    def series(self, commodity=None, state=None, **query) -> dict | None:
+        """Downsampled price points for one commodity/state series."""
+        if self.store() is None:
+            return None
+        result = self._series.query(commodity or "", state or "", **query)
+        if result is None:
+            return {"resolution": query.get("resolution", "auto"), "points": []}
+        return result
+
+    def stats(self) -> dict:
+        store = self._store
+        return {
+            "store_path": self.store_path,
+            "records": len(store) if store is not None else 0,
+            "series": len(self._series) if self._series is not None else 0,
+            "fetched_at": store.fetched_at if store is not None else None,
+            "refreshing": self._refreshing.is_set(),
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "last_refresh_error": self.last_refresh_error,
+            "consecutive_failures": self.consecutive_failures,
+            "last_failure_at": self.last_failure_at,
+            "retry_in_seconds": round(max(self._retry_at - time.monotonic(), 0.0), 1),
+            "summary_cache": self._summaries.stats(),
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the local e-NAM price store")
+    parser.add_argument("--store", default=os.environ.get("MANDI_STORE_PATH") or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "data", "mandi_prices.npz"))
+    parser.add_argument("--base-url", default=os.environ.get("ENAM_API_BASE", DEFAULT_BASE_URL))
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    api_key = os.environ.get("ENAM_API_KEY", DEFAULT_API_KEY)
+    service = MandiService(args.store, lambda: DataGovSource(api_key, base_url=args.base_url), days=args.days)
+    if not service.refresh():
+        print("[MANDI] Another process is already refreshing the store")
@@ -0,0 +1,232 @@
+from __future__ import annotations
+"""
+Taaza Mandi – product image pipeline
+- Uploads are spooled to disk in fixed-size chunks, never held whole in memory
+- WebP derivatives (thumb / card / full) are built and uploaded on a worker
+  pool after the request has already returned
+- Product rows are updated with the derivative URLs once they exist
+- Queue depth, outcomes and processing times via stats()
+"""
+
+import contextvars
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from jsonlog import default_logger
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it the original is uploaded as-is
+    Image = ImageOps = None
+
+# name -> longest edge in pixels
+DERIVATIVES = {"thumb": 160, "card": 480, "full": 1600}
+WEBP_QUALITY = 80
+CHUNK_SIZE = 256 * 1024
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+)
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def spool_upload(stream, directory: str, max_bytes: int, chunk_size: int = CHUNK_SIZE) -> tuple:
+    """Copy an upload stream to a temp file in chunks; returns ``(path, size)``."""
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="upload_", dir=directory)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Image is larger than {max_bytes // (1024 * 1024)} MB")
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size
+
+
+def sniff_content_type(path: str) -> str:
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return "application/octet-stream"
+
+
+def build_derivatives(path: str, sizes: dict = DERIVATIVES, quality: int = WEBP_QUALITY) -> dict | None:
+    """WebP bytes per derivative name, or None without Pillow.
+
+    Raises whatever Pillow raises for a file it can't decode.
+    """
+    if Image is None:
+        return None
+    with Image.open(path) as img:
+        # JPEGs decode straight at a reduced scale when far larger than needed
+        largest = max(sizes.values())
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        out = {}
+        # Largest first, each one shrinking the previous result
+        for name, edge in sorted(sizes.items(), key=lambda kv: -kv[1]):
+            img.thumbnail((edge, edge), Image.LANCZOS)
+            buf = io.BytesIO()
+            img.save(buf, "WEBP", quality=quality, method=4)
+            out[name] = buf.getvalue()
+        return out
+
+
+def public_url(resp) -> str:
+    """get_public_url returns a str or a dict depending on the supabase-py version."""
+    if isinstance(resp, str):
+        return resp
+    return resp.get("publicURL") or resp.get("publicUrl") or ""
+
+
+class ImageJob:
+    __slots__ = ("token", "product_id", "spool_path", "base_path", "queued_at")
+
+    def __init__(self, token: str, product_id, spool_path: str, base_path: str):
+        self.token = token
+        self.product_id = product_id
+        self.spool_path = spool_path
+        self.base_path = base_path
+        self.queued_at = time.monotonic()
+
+
+class ImagePipeline:
+    """Builds and uploads product image derivatives on background threads.
+
+    ``client_factory(token)`` returns a user-scoped client with ``storage``
+    and ``table``; ``on_complete(product_id, fields)`` runs with the columns
+    written once the product row has been updated. Failures are logged as
+    ``image.*`` events carrying the product id and the submitting request's id.
+    """
+
+    def __init__(self, client_factory, bucket: str = "products", workers: int = 2,
+                 on_complete=None, log=None):
+        self.client_factory = client_factory
+        self.bucket = bucket
+        self.on_complete = on_complete
+        self.log = log or default_logger()
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-pipeline")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_progress = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.total_wait_seconds = 0.0
+        self.last_error = None
+
+    def submit(self, token: str, product_id, spool_path: str, base_path: str) -> None:
+        with self._lock:
+            self.queued += 1
+        # Run in a copy of the caller's context so log lines keep its request id
+        ctx = contextvars.copy_context()
+        self._executor.submit(ctx.run, self._run, ImageJob(token, product_id, spool_path, base_path))
+
+    def _run(self, job: ImageJob) -> None:
+        started = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            self.in_progress += 1
+            self.total_wait_seconds += started - job.queued_at
+        ok = False
+        try:
+            fields = self._process(job)
+            if self.on_complete is not None:
+                self.on_complete(job.product_id, fields)
+            ok = True
+        except Exception as e:
+            self.last_error = str(e)
+            self.log.warning("image.job_failed", product_id=job.product_id, error=str(e))
+        finally:
+            try:
+                os.remove(job.spool_path)
+            except OSError:
+                pass
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.in_progress -= 1
+                self.completed += ok
+                self.failed += not ok
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    def _process(self, job: ImageJob) -> dict:
+        client = self.client_factory(job.token)
+        bucket = client.storage.from_(self.bucket)
+
+        try:
+            derivatives = build_derivatives(job.spool_path)
+        except Exception as e:
+            self.log.warning("image.decode_failed", product_id=job.product_id, error=str(e))
+            derivatives = None
+        if derivatives is not None:
+            uploads = {
+                name: (f"{job.base_path}_{name}.webp", data, "image/webp")
+                for name, data in derivatives.items()
+            }
+        else:
+            # No Pillow / undecodable format: keep the original as the only variant
+            uploads = {"full": (job.base_path, None, sniff_content_type(job.spool_path))}
+
+        urls = {}
+        for name, (path, data, content_type) in uploads.items():
+            options = {"content-type": content_type, "cache-control": "31536000"}
+            if data is None:
+                with open(job.spool_path, "rb") as f:  # streamed from disk
+                    bucket.upload(path=path, file=f, file_options=options)
+            else:
+                bucket.upload(path=path, file=data, file_options=options)
+            urls[name] = public_url(bucket.get_public_url(path))
+
+        # Feeds render images[0] at card size; the full image follows it
+        fields = {
+            "images": [urls["card"], urls["full"]] if "card" in urls else [urls["full"]],
+            "image_variants": urls,
+        }
+        try:
+            client.table("products").update(fields).eq("id", job.product_id).execute()
+        except Exception:
+            # Older schemas have no image_variants column
+            fields.pop("image_variants")
+            client.table("products").update(fields).eq("id", job.product_id).execute()
+        return fields
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self.completed + self.failed
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queued,
+                "in_progress": self.in_progress,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_processing_ms": round(self.total_seconds / done * 1000, 2) if done else 0.0,
+                "max_processing_ms": round(self.max_seconds * 1000, 2),
+                "avg_queue_wait_ms": round(self.total_wait_seconds / done * 1000, 2) if done else 0.0,
+                "pillow": Image is not None,
+                "last_error": self.last_error,
+            }
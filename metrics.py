@@ -0,0 +1,193 @@
+from __future__ import annotations
+"""
+Taaza Mandi – in-process metrics in Prometheus text format
+- Counters, gauges and fixed-bucket latency histograms, optionally labelled
+- Observing is a dict lookup, a bisect and one short lock per labelled
+  series; all formatting happens at scrape time
+- Collectors turn existing stats() dicts into gauges when /metrics is read
+- Per process: under several workers, scrape each or aggregate by instance
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from jsonlog import default_logger
+
+# Seconds; spans sub-millisecond cache hits up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> series state
+
+    def _get(self, labelvalues: tuple):
+        series = self._series.get(labelvalues)
+        if series is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {labelvalues}")
+            with self._lock:
+                series = self._series.setdefault(labelvalues, self._new())
+        return series
+
+    def _new(self):
+        return [0.0]
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic count; by convention the name ends in ``_total``."""
+
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        series = self._get(labelvalues)
+        with self._lock:
+            series[0] += amount
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(values, series[0]) for values, series in self._series.items()]
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, values)} {_number(v)}" for values, v in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues) -> None:
+        series = self._get(labelvalues)
+        with self._lock:
+            series[0] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new(self):
+        # Per-bucket (not cumulative) counts, an overflow slot, then the sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def observe(self, value: float, *labelvalues) -> None:
+        series = self._get(labelvalues)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series[i] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def render(self) -> list:
+        with self._lock:
+            items = [(values, list(series)) for values, series in self._series.items()]
+        lines = self.header()
+        for values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Owns the app's metrics and renders them all for /metrics."""
+
+    def __init__(self, prefix: str = "", log=None):
+        self.prefix = prefix
+        self.log = log or default_logger()
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._add(Counter(self.prefix + name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()) -> Gauge:
+        return self._add(Gauge(self.prefix + name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, documentation, labelnames, buckets))
+
+    def collector(self, func):
+        """Register ``func() -> iterable of (name, help, {label tuple: value}, labelnames)``.
+
+        Called on every scrape; the values are exported as gauges. Usable as
+        a decorator.
+        """
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for func in self._collectors:
+            try:
+                families = list(func())
+            except Exception as e:  # a broken collector must not take /metrics down
+                self.log.warning("metrics.collector_failed", collector=getattr(func, "__name__", repr(func)),
+                                 error=str(e))
+                continue
+            for name, documentation, samples, labelnames in families:
+                lines.append(f"# HELP {self.prefix}{name} {_escape(documentation)}")
+                lines.append(f"# TYPE {self.prefix}{name} gauge")
+                for values, value in samples.items():
+                    if value is None:
+                        continue
+                    lines.append(f"{self.prefix}{name}{_labels(labelnames, values)} {_number(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,59 @@
+"""Compare the pickled RandomForest with its FlatForest export.
+
+Checks that both give identical probabilities and predictions, then times
+loading and scoring at a few batch sizes. Run from the repo root:
+
+    python model/benchmark.py
+"""
+import os
+import sys
+import time
+import warnings
+
+import joblib as jb
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference import FlatForest
+
+PKL_PATH = 'model/final_model.pkl'
+NPZ_PATH = 'model/final_model.npz'
+BATCH_SIZES = (1, 16, 64, 512)
+REPEATS = 50
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats * 1000, result
+
+
+warnings.filterwarnings('ignore')  # pickle may come from another sklearn minor
+
+load_pkl_ms, rf = timed(lambda: jb.load(PKL_PATH), 3)
+load_npz_ms, flat = timed(lambda: FlatForest.load(NPZ_PATH), 3)
+
+ds = pd.read_csv('model/Crop_recommendation.csv')
+X = ds[['N', 'P', 'K', 'humidity', 'rainfall']].to_numpy(dtype=float)
+rng = np.random.default_rng(42)
+X_random = rng.uniform([0, 0, 0, 0, 0], [200, 150, 200, 100, 3000], size=(10000, 5))
+
+for name, data in (('dataset', X), ('random', X_random)):
+    same_proba = np.array_equal(rf.predict_proba(data), flat.predict_proba(data))
+    same_pred = bool((rf.predict(data) == flat.predict(data)).all())
+    print(f"{name:8s} rows={len(data):6d} identical_proba={same_proba} identical_pred={same_pred}")
+    if not (same_proba and same_pred):
+        sys.exit(1)
+
+print()
+print(f"{'':10s}{'sklearn':>12s}{'flat':>12s}{'speedup':>10s}")
+print(f"{'load ms':10s}{load_pkl_ms:12.2f}{load_npz_ms:12.2f}{load_pkl_ms / load_npz_ms:9.1f}x")
+for n in BATCH_SIZES:
+    batch = X_random[:n]
+    sk_ms, _ = timed(lambda: rf.predict(batch), REPEATS)
+    flat_ms, _ = timed(lambda: flat.predict(batch), REPEATS)
+    print(f"{'batch ' + str(n):10s}{sk_ms:12.3f}{flat_ms:12.3f}{sk_ms / flat_ms:9.1f}x")
+print()
+print(f"artifact bytes: pickle={os.path.getsize(PKL_PATH)} flat={os.path.getsize(NPZ_PATH)}")
@@ -1,30 +1,224 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+"""Train the crop recommendation forest.
+
+Runs a cross-validated search over forest size and depth in a process pool,
+records training time, accuracy and single-row inference latency for every
+candidate, and keeps the fastest model whose accuracy is within tolerance of
+the best (and inside the latency budget). The chosen forest is written as a
+pickle and as a compact FlatForest artifact, optionally with trees pruned
+against a held-out validation split. Run from the repo root:
+
+    python model/final_model.py --n-estimators 25 50 100 --max-depth 0 12
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib as jb
 import numpy as np
-import seaborn as sns
-from sklearn.model_selection import train_test_split
+import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import joblib as jb
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold, cross_validate, train_test_split
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference import FlatForest
+
+FEATURES = ['N', 'P', 'K', 'humidity', 'rainfall']
+LATENCY_REPEATS = 200
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--data', default='model/Crop_recommendation.csv')
+    parser.add_argument('--out-dir', default='model')
+    parser.add_argument('--n-estimators', type=int, nargs='+', default=[10, 25, 50, 100, 200])
+    parser.add_argument('--max-depth', type=int, nargs='+', default=[0, 8, 12, 16],
+                        help='0 means unlimited depth')
+    parser.add_argument('--cv', type=int, default=5)
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--val-size', type=float, default=0.1,
+                        help='fraction held out from training to validate tree pruning')
+    parser.add_argument('--prune-tolerance', type=float, default=None,
+                        help='drop trees while validation accuracy stays within this '
+                             'of the full forest (default: keep every tree)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--n-jobs', type=int, default=os.cpu_count() or 1,
+                        help='worker processes for the search')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.005,
+                        help='accept candidates this far below the best CV accuracy')
+    parser.add_argument('--latency-budget-ms', type=float, default=2.0,
+                        help='max median single-row predict latency (flat engine)')
+    parser.add_argument('--dry-run', action='store_true', help='search only, write nothing')
+    return parser.parse_args(argv)
+
+
+def load_dataset(path):
+    ds = pd.read_csv(path)
+    return ds[FEATURES].to_numpy(dtype=float), ds['label'].to_numpy()
+
+
+def evaluate_candidate(params, X_train, y_train, cv, seed):
+    """Cross-validate one parameter set, then fit it on the full training split."""
+    n_estimators, max_depth = params
+    rf = RandomForestClassifier(
+        n_estimators=n_estimators,
+        max_depth=max_depth or None,
+        random_state=seed,
+        n_jobs=1,
+    )
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=seed)
+    scores = cross_validate(rf, X_train, y_train, cv=folds, scoring='accuracy', n_jobs=1)
+
+    start = time.perf_counter()
+    rf.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+
+    return {
+        'n_estimators': n_estimators,
+        'max_depth': max_depth or None,
+        'cv_accuracy': float(np.mean(scores['test_score'])),
+        'cv_accuracy_std': float(np.std(scores['test_score'])),
+        'fit_time_s': fit_time,
+    }, rf
+
+
+def median_latency_ms(predict, rows):
+    timings = []
+    for i in range(LATENCY_REPEATS):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        predict(row)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def median_load_ms(load, repeats=5):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def select(results, accuracy_tolerance, latency_budget_ms):
+    """Fastest candidate within tolerance of the best accuracy and inside the budget."""
+    within_budget = [r for r in results if r['latency_ms'] <= latency_budget_ms]
+    if not within_budget:
+        print(f"No candidate meets the {latency_budget_ms} ms budget; ignoring it")
+        within_budget = results
+    best = max(r['cv_accuracy'] for r in within_budget)
+    eligible = [r for r in within_budget if r['cv_accuracy'] >= best - accuracy_tolerance]
+    return min(eligible, key=lambda r: (r['latency_ms'], -r['cv_accuracy']))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    X, y = load_dataset(args.data)
+    print(f"{len(X)} rows, {len(np.unique(y))} crops")
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=args.test_size, random_state=args.seed, stratify=y
+    )
+    prune = args.prune_tolerance is not None
+    if prune:
+        X_train, X_val, y_train, y_val = train_test_split(
+            X_train, y_train, test_size=args.val_size / (1 - args.test_size),
+            random_state=args.seed, stratify=y_train
+        )
+
+    grid = [(n, d) for n in args.n_estimators for d in args.max_depth]
+    print(f"Searching {len(grid)} candidates with {args.cv}-fold CV on {args.n_jobs} processes")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.n_jobs) as pool:
+        futures = [
+            pool.submit(evaluate_candidate, params, X_train, y_train, args.cv, args.seed)
+            for params in grid
+        ]
+        evaluated = [f.result() for f in futures]
+    print(f"Search took {time.perf_counter() - start:.1f} s")
+
+    # Latency is measured serially here so candidates don't contend for CPU
+    results, models = [], []
+    for result, rf in evaluated:
+        flat = FlatForest.from_sklearn(rf)
+        result['latency_ms'] = median_latency_ms(flat.predict, X_test)
+        result['sklearn_latency_ms'] = median_latency_ms(rf.predict, X_test)
+        results.append(result)
+        models.append(rf)
+
+    print()
+    print(f"{'trees':>6s}{'depth':>7s}{'cv_acc':>9s}{'fit_s':>8s}{'flat_ms':>9s}{'sk_ms':>8s}")
+    for r in results:
+        print(f"{r['n_estimators']:6d}{str(r['max_depth']):>7s}{r['cv_accuracy']:9.4f}"
+              f"{r['fit_time_s']:8.2f}{r['latency_ms']:9.3f}{r['sklearn_latency_ms']:8.3f}")
+
+    chosen = select(results, args.accuracy_tolerance, args.latency_budget_ms)
+    rf = models[results.index(chosen)]
+    test_accuracy = accuracy_score(y_test, rf.predict(X_test))
+    print()
+    print(f"Chosen: {chosen['n_estimators']} trees, max_depth={chosen['max_depth']}, "
+          f"cv_acc={chosen['cv_accuracy']:.4f}, test_acc={test_accuracy:.4f}, "
+          f"latency={chosen['latency_ms']:.3f} ms")
+
+    if args.dry_run:
+        return
 
-ds = pd.read_csv('model/Crop_recommendation.csv')
-print(ds['label'].unique())
+    pkl_path = os.path.join(args.out_dir, 'final_model.pkl')
+    npz_path = os.path.join(args.out_dir, 'final_model.npz')
+    jb.dump(rf, pkl_path)
+    print(f"Model saved as {pkl_path}")
 
-ds.drop(columns=['ph'], inplace=True)
-ds.drop(columns=['temperature'], inplace=True)
+    # Compact copy for the NumPy inference engine app.py serves from
+    flat = FlatForest.from_sklearn(rf)
+    assert np.array_equal(flat.predict_proba(X_test), rf.predict_proba(X_test))
+    if prune:
+        flat = flat.prune_trees(X_val, y_val, args.prune_tolerance)
+    flat.save(npz_path)
+    flat_accuracy = accuracy_score(y_test, flat.predict(X_test))
+    agreement = float(np.mean(flat.predict(X_test) == rf.predict(X_test)))
+    print(f"Compact forest saved as {npz_path}: {flat.n_trees}/{len(rf.estimators_)} trees, "
+          f"test_acc={flat_accuracy:.4f}, agreement with full forest={agreement:.4f}")
 
-X = ds[['N', 'P', 'K', 'humidity', 'rainfall']]
-y = ds['label']
+    artifacts = {
+        'pickle': {
+            'path': pkl_path,
+            'bytes': os.path.getsize(pkl_path),
+            'load_ms': median_load_ms(lambda: jb.load(pkl_path)),
+        },
+        'compact': {
+            'path': npz_path,
+            'bytes': os.path.getsize(npz_path),
+            'load_ms': median_load_ms(lambda: FlatForest.load(npz_path)),
+            'header': flat.header(),
+            'test_accuracy': float(flat_accuracy),
+            'agreement': agreement,
+        },
+    }
+    print()
+    print(f"{'artifact':10s}{'bytes':>12s}{'load_ms':>10s}")
+    for name, info in artifacts.items():
+        print(f"{name:10s}{info['bytes']:12d}{info['load_ms']:10.2f}")
+    print()
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    report = {
+        'data': args.data,
+        'seed': args.seed,
+        'cv_folds': args.cv,
+        'accuracy_tolerance': args.accuracy_tolerance,
+        'latency_budget_ms': args.latency_budget_ms,
+        'candidates': results,
+        'chosen': {**chosen, 'test_accuracy': float(test_accuracy)},
+        'artifacts': artifacts,
+    }
+    report_path = os.path.join(args.out_dir, 'training_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved as {report_path}")
 
-# Random Forest
-rf = RandomForestClassifier(n_estimators=100, random_state=42)
-rf.fit(X_train, y_train)
-y_pred = rf.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-# print("Random Forest Model Accuracy:", round(accuracy * 100, 2), "%")
-# print("\nClassification Report:\n", classification_report(y_test, y_pred))
 
-jb.dump(rf, 'model/final_model.pkl')
-print("Model saved as model/final_model.pkl")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
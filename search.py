@@ -0,0 +1,372 @@
+from __future__ import annotations
+"""
+Taaza Mandi – product search index
+- In-memory inverted index over title, description, category and location
+- BM25 ranking with per-field weights
+- Prefix (as-you-type), trigram fuzzy (typos) and regional-name synonym expansion
+- Incremental add / patch / remove; periodic full rebuild from Supabase
+"""
+
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from jsonlog import default_logger
+
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "location": 1.5, "description": 1.0}
+
+# Each group is interchangeable in queries: regional / transliterated crop names
+SYNONYMS = (
+    ("tomato", "tamatar", "tamater", "thakkali"),
+    ("potato", "aloo", "alu", "batata"),
+    ("onion", "pyaz", "pyaaz", "kanda", "vengayam"),
+    ("okra", "bhindi", "ladyfinger", "vendakkai"),
+    ("cauliflower", "gobhi", "gobi", "phoolgobhi"),
+    ("cabbage", "bandgobhi", "pattagobhi"),
+    ("brinjal", "eggplant", "baingan", "baigan", "vangi", "kathirikai"),
+    ("chilli", "chili", "mirchi", "mirch", "milagai"),
+    ("turmeric", "haldi", "manjal", "halad"),
+    ("coriander", "dhaniya", "dhania", "kothamalli"),
+    ("wheat", "gehu", "gehun", "godhuma"),
+    ("rice", "chawal", "dhan", "paddy", "arisi"),
+    ("maize", "corn", "makka", "makki", "bhutta"),
+    ("bajra", "millet", "kambu", "sajje"),
+    ("jowar", "sorghum", "cholam"),
+    ("ragi", "nachni", "mandua"),
+    ("chickpea", "chana", "gram", "kadalai"),
+    ("mustard", "sarson", "rai", "kadugu"),
+    ("groundnut", "peanut", "moongphali", "mungfali", "shengdana", "kadalai"),
+    ("cotton", "kapas"),
+    ("mango", "aam", "mambazham"),
+    ("banana", "kela", "vazhai", "keli"),
+    ("apple", "seb", "saeb"),
+    ("orange", "santra", "narangi"),
+    ("grapes", "angoor", "angur"),
+    ("lemon", "nimbu", "limbu", "elumichai"),
+    ("ginger", "adrak", "inji"),
+    ("garlic", "lehsun", "lahsun", "poondu"),
+    ("spinach", "palak", "keerai"),
+    ("peas", "matar", "mattar"),
+    ("carrot", "gajar"),
+    ("radish", "mooli", "mullangi"),
+    ("pumpkin", "kaddu", "kaddoo"),
+    ("cucumber", "kheera", "kakdi"),
+    ("cumin", "jeera", "jeeragam"),
+    ("pigeonpea", "toor", "tur", "arhar"),
+    ("lentil", "masoor", "dal", "daal"),
+)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text) -> list:
+    return _TOKEN.findall(str(text or "").casefold())
+
+
+def trigrams(term: str) -> set:
+    padded = f"^{term}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _timestamp(value) -> float:
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class SearchIndex:
+    """Thread-safe inverted index; reads never see a half-applied update."""
+
+    def __init__(self, synonyms=SYNONYMS, k1: float = 1.2, b: float = 0.75,
+                 max_expansions: int = 30, min_similarity: float = 0.5, log=None):
+        self.log = log or default_logger()
+        self.k1 = k1
+        self.b = b
+        self.max_expansions = max_expansions
+        self.min_similarity = min_similarity
+        self.synonym_groups = synonyms
+        self._synonyms = {}
+        for group in synonyms:
+            for term in group:
+                self._synonyms.setdefault(term, set()).update(t for t in group if t != term)
+        self._lock = threading.RLock()
+        self._reset()
+        self.loaded_at = None
+        self._loading = threading.Lock()
+
+    def _reset(self) -> None:
+        self._rows = []          # doc -> product row, None once removed
+        self._doc_of = {}        # product id -> doc
+        self._postings = {}      # term -> ([doc, ...], [weighted tf, ...])
+        self._arrays = {}        # term -> (docs, tf) ndarrays, rebuilt lazily
+        self._terms = sorted(self._synonyms)  # every known term, for prefix lookups
+        self._trigrams = {}
+        for term in self._terms:
+            self._add_trigrams(term)
+        self._columns = {
+            "alive": np.zeros(0, dtype=bool),
+            "length": np.zeros(0),
+            "price": np.zeros(0),
+            "created": np.zeros(0),
+        }
+        self._size = 0
+        self._total_length = 0.0
+        self._categories = {}    # lowercased name -> code
+        self._locations = {}
+        self._category = np.zeros(0, dtype=np.int32)
+        self._location = np.zeros(0, dtype=np.int32)
+
+    def _add_trigrams(self, term: str) -> None:
+        for gram in trigrams(term):
+            self._trigrams.setdefault(gram, set()).add(term)
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._columns["alive"])
+        if needed <= capacity:
+            return
+        capacity = max(capacity * 2, needed, 1024)
+        self._columns = {name: np.resize(values, capacity) for name, values in self._columns.items()}
+        self._category = np.resize(self._category, capacity)
+        self._location = np.resize(self._location, capacity)
+
+    # ---------- updates ----------
+
+    def add_many(self, rows) -> None:
+        """Index product rows; a row with a known id replaces the old one."""
+        with self._lock:
+            new_terms = []
+            for row in rows:
+                new_terms.extend(self._add(row))
+            if len(new_terms) > 64:
+                self._terms = sorted(set(self._terms).union(new_terms))
+            else:
+                for term in new_terms:
+                    insort(self._terms, term)
+
+    def add(self, row: dict) -> None:
+        self.add_many([row])
+
+    def _add(self, row: dict) -> list:
+        product_id = row.get("id")
+        if product_id is not None and product_id in self._doc_of:
+            self._remove(product_id)
+
+        doc = self._size
+        self._grow(doc + 1)
+        self._size += 1
+        self._rows.append(dict(row))
+        if product_id is not None:
+            self._doc_of[product_id] = doc
+
+        weights = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field)):
+                weights[token] += weight
+        length = sum(weights.values())
+
+        new_terms = []
+        for term, tf in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = ([], [])
+                if term not in self._synonyms:
+                    new_terms.append(term)
+                    self._add_trigrams(term)
+            postings[0].append(doc)
+            postings[1].append(tf)
+            self._arrays.pop(term, None)
+
+        try:
+            price = float(row.get("price"))
+        except (TypeError, ValueError):
+            price = math.nan
+        c = self._columns
+        c["alive"][doc] = True
+        c["length"][doc] = length
+        c["price"][doc] = price
+        c["created"][doc] = _timestamp(row.get("created_at"))
+        self._category[doc] = self._categories.setdefault(str(row.get("category") or "").casefold(), len(self._categories))
+        self._location[doc] = self._locations.setdefault(str(row.get("location") or "").casefold(), len(self._locations))
+        self._total_length += length
+        return new_terms
+
+    def patch(self, product_id, fields: dict) -> None:
+        """Update stored fields that aren't searchable (e.g. image URLs)."""
+        with self._lock:
+            doc = self._doc_of.get(product_id)
+            if doc is not None and self._rows[doc] is not None:
+                self._rows[doc] = {**self._rows[doc], **fields}
+
+    def remove(self, product_id) -> None:
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id) -> None:
+        doc = self._doc_of.pop(product_id, None)
+        if doc is None:
+            return
+        # Tombstone: postings stay until the next rebuild, masked out at query time
+        self._columns["alive"][doc] = False
+        self._total_length -= self._columns["length"][doc]
+        self._rows[doc] = None
+
+    def replace_all(self, rows) -> None:
+        """Rebuild from scratch off to the side, then swap in."""
+        fresh = SearchIndex(self.synonym_groups, k1=self.k1, b=self.b,
+                            max_expansions=self.max_expansions, min_similarity=self.min_similarity,
+                            log=self.log)
+        fresh.add_many(rows)
+        with self._lock:
+            for name in ("_rows", "_doc_of", "_postings", "_arrays", "_terms", "_trigrams", "_columns",
+                         "_size", "_total_length", "_categories", "_locations", "_category", "_location"):
+                setattr(self, name, getattr(fresh, name))
+            self.loaded_at = time.time()
+
+    def ensure_loaded(self, loader, max_age: float) -> None:
+        """Load on first use (blocking) and refresh in the background when stale."""
+        if self.loaded_at is not None and time.time() - self.loaded_at < max_age:
+            return
+        if self.loaded_at is None:
+            with self._loading:
+                if self.loaded_at is None:
+                    self.replace_all(loader())
+            return
+        if self._loading.acquire(blocking=False):
+            def refresh():
+                try:
+                    self.replace_all(loader())
+                except Exception as e:
+                    self.log.warning("search.rebuild_failed", error=str(e))
+                finally:
+                    self._loading.release()
+            threading.Thread(target=refresh, name="search-rebuild", daemon=True).start()
+
+    # ---------- queries ----------
+
+    def _posting_arrays(self, term: str):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            docs, tf = self._postings[term]
+            arrays = self._arrays[term] = (np.array(docs, dtype=np.int64), np.array(tf))
+        return arrays
+
+    def _fuzzy(self, token: str) -> list:
+        grams = trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigrams.get(gram, ()))
+        out = []
+        for term, n in shared.items():
+            similarity = 2 * n / (len(grams) + len(term) + 1)  # len(trigrams(term)) == len(term) + 1
+            if similarity >= self.min_similarity and term != token:
+                out.append((similarity, term))
+        out.sort(reverse=True)
+        return out[:self.max_expansions]
+
+    def _prefixed(self, prefix: str) -> list:
+        out = []
+        i = bisect_left(self._terms, prefix)
+        while i < len(self._terms) and self._terms[i].startswith(prefix) and len(out) < 200:
+            if self._terms[i] != prefix:
+                out.append(self._terms[i])
+            i += 1
+        return out
+
+    def expand(self, token: str, is_last: bool) -> dict:
+        """Indexed terms a query token should match, with a weight for each."""
+        candidates = {token: 1.0}
+        if is_last and len(token) >= 2:
+            for term in self._prefixed(token):
+                candidates.setdefault(term, 0.7)
+        # A known regional name already expands through its synonyms; fuzzing it
+        # too would let "tamatar" reach "matar" and then "peas"
+        if token not in self._postings and token not in self._synonyms:
+            for similarity, term in self._fuzzy(token):
+                candidates.setdefault(term, 0.8 * similarity)
+
+        weights = {}
+        for term, weight in candidates.items():
+            for t, w in [(term, weight)] + [(s, weight * 0.9) for s in self._synonyms.get(term, ())]:
+                if t in self._postings and w > weights.get(t, 0.0):
+                    weights[t] = w
+        if len(weights) > self.max_expansions:
+            top = sorted(weights.items(), key=lambda kv: (-kv[1], -len(self._postings[kv[0]][0])))
+            weights = dict(top[:self.max_expansions])
+        return weights
+
+    def search(self, query: str, category: str = "", location: str = "", min_price=None, max_price=None,
+               sort: str = "relevance", limit: int = 12, offset: int = 0) -> dict:
+        started = time.perf_counter()
+        tokens = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            n = self._size
+            c = {name: values[:n] for name, values in self._columns.items()}
+            mask = c["alive"].copy()
+            if category:
+                mask &= self._category[:n] == self._categories.get(category.casefold(), -1)
+            if location:
+                mask &= self._location[:n] == self._locations.get(location.casefold(), -1)
+            if min_price is not None:
+                mask &= c["price"] >= min_price
+            if max_price is not None:
+                mask &= c["price"] <= max_price
+
+            score = np.zeros(n)
+            matched = np.zeros(n, dtype=np.int32)
+            live = max(int(c["alive"].sum()), 1)
+            avg_length = self._total_length / live if self._total_length > 0 else 1.0
+            for i, token in enumerate(tokens):
+                token_score = np.zeros(n)
+                for term, weight in self.expand(token, i == len(tokens) - 1).items():
+                    docs, tf = self._posting_arrays(term)
+                    idf = math.log(1 + (live - len(docs) + 0.5) / (len(docs) + 0.5))
+                    norm = self.k1 * (1 - self.b + self.b * c["length"][docs] / avg_length)
+                    s = weight * idf * tf * (self.k1 + 1) / (tf + norm)
+                    token_score[docs] = np.maximum(token_score[docs], s)
+                score += token_score
+                matched += token_score > 0
+
+            if tokens:
+                # Prefer listings matching every word; fall back to any word
+                mask &= matched > 0
+                if np.any(mask & (matched == len(tokens))):
+                    mask &= matched == len(tokens)
+            candidates = np.flatnonzero(mask)
+
+            if sort == "price-low":
+                key = c["price"][candidates]
+            elif sort == "price-high":
+                key = -c["price"][candidates]
+            elif sort == "latest" or not tokens:
+                key = -c["created"][candidates]
+            else:
+                key = -score[candidates]
+            end = min(offset + limit, len(candidates))
+            if end < len(candidates):
+                top = np.argpartition(key, end - 1)[:end] if end else np.zeros(0, dtype=np.int64)
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(key[top], kind="stable")][offset:end]
+            results = [{**self._rows[d], "score": round(float(score[d]), 4)} for d in candidates[top]]
+
+        return {
+            "products": results,
+            "total": int(len(candidates)),
+            "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": int(self._columns["alive"][:self._size].sum()),
+                "tombstones": int(self._size - self._columns["alive"][:self._size].sum()),
+                "terms": len(self._postings),
+                "loaded_at": self.loaded_at,
+            }
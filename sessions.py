@@ -0,0 +1,314 @@
+from __future__ import annotations
+"""
+Taaza Mandi – server-side sessions
+- The cookie holds only a random session id; the session data (access token,
+  user profile, flashes) stays on the server
+- Stores: in-memory LRU (one process) or SQLite (every worker on the host)
+- Idle expiry: a session is dropped after ``idle_ttl`` seconds without a
+  request; a background sweeper deletes expired rows
+- Writes only when the session changed, and the cookie is re-issued only
+  when the id changes or half its lifetime has passed
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from jsonlog import default_logger
+
+# Stored expiry is only pushed forward once it has slid this far
+TOUCH_INTERVAL = 60.0
+# Bookkeeping keys; a session holding only these is not worth storing
+_META_KEYS = ("_permanent", "_cookie_issued")
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def _valid_id(sid: str | None) -> bool:
+    return bool(sid) and 32 <= len(sid) <= 64 and all(c.isalnum() or c in "-_" for c in sid)
+
+
+class MemoryStore:
+    """Sessions in this process only, least recently used evicted first."""
+
+    kind = "memory"
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # sid -> (serialized data, expires)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expired = 0
+
+    def load(self, sid: str, ttl: float) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires <= now:
+                del self._data[sid]
+                self.expired += 1
+                return None
+            self._data[sid] = (data, now + ttl)
+            self._data.move_to_end(sid)
+            return data
+
+    def save(self, sid: str, data: str, ttl: float) -> None:
+        with self._lock:
+            self._data[sid] = (data, time.time() + ttl)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            stale = [sid for sid, (_, expires) in self._data.items() if expires <= now]
+            for sid in stale:
+                del self._data[sid]
+            self.expired += len(stale)
+        return len(stale)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": self.kind,
+                "sessions": len(self._data),
+                "maxsize": self.maxsize,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+class SqliteStore:
+    """Sessions in a local SQLite file (WAL), shared by all workers on the host."""
+
+    kind = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.expired = 0
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread (and per forked worker)
+        db = getattr(self._local, "db", None)
+        if db is None or getattr(self._local, "pid", None) != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def load(self, sid: str, ttl: float) -> str | None:
+        db = self._connect()
+        now = time.time()
+        row = db.execute("SELECT data, expires FROM sessions WHERE sid = ?", (sid,)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if row[1] < now + ttl - TOUCH_INTERVAL:
+            db.execute("UPDATE sessions SET expires = ? WHERE sid = ?", (now + ttl, sid))
+        return row[0]
+
+    def save(self, sid: str, data: str, ttl: float) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)",
+            (sid, data, time.time() + ttl),
+        )
+
+    def delete(self, sid: str) -> None:
+        self._connect().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self) -> int:
+        removed = self._connect().execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),)).rowcount
+        with self._lock:
+            self.expired += removed
+        return removed
+
+    def stats(self) -> dict:
+        count = self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        with self._lock:
+            return {
+                "backend": self.kind,
+                "path": self.path,
+                "sessions": count,
+                "expired": self.expired,
+            }
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that tracks changes and knows its id."""
+
+    def __init__(self, initial=None, sid: str | None = None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid or new_session_id()
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.previous_sid = None
+
+    @property
+    def permanent(self) -> bool:
+        return self.get("_permanent", False)
+
+    @permanent.setter
+    def permanent(self, value: bool) -> None:
+        # Setting it again every request must not count as a change
+        if self.get("_permanent", False) != bool(value):
+            self["_permanent"] = bool(value)
+
+    def regenerate(self) -> None:
+        """Move the data to a fresh id (call on login against session fixation)."""
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = new_session_id()
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface backed by a MemoryStore or SqliteStore."""
+
+    serializer = session_json_serializer
+
+    def __init__(self, store, idle_ttl: float = 86400.0, sweep_interval: float = 300.0, log=None):
+        self.store = store
+        self.log = log or default_logger()
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+        self._start_lock = threading.Lock()
+        self.sweeps = 0
+        self.loaded = 0
+        self.saved = 0
+        self.cookies_set = 0
+
+    def _ensure_sweeper(self) -> None:
+        # Started lazily so each forked server worker gets its own thread
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        with self._start_lock:
+            if self._sweeper is None or not self._sweeper.is_alive():
+                self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.store.sweep()
+                self.sweeps += 1
+            except Exception as e:
+                self.log.warning("session.sweep_failed", backend=self.store.kind, error=str(e))
+
+    def open_session(self, app, request):
+        self._ensure_sweeper()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if _valid_id(sid):
+            data = self.store.load(sid, self.idle_ttl)
+            if data is not None:
+                try:
+                    session = ServerSession(self.serializer.loads(data), sid=sid)
+                except ValueError:
+                    pass
+                else:
+                    self.loaded += 1
+                    return session
+        return ServerSession(new=True)
+
+    def _cookie_due(self, app, session: ServerSession) -> bool:
+        """The cookie needs (re)sending: new id, or half its lifetime used."""
+        if session.new or session.previous_sid is not None:
+            return True
+        if not session.permanent:
+            return False
+        issued = session.get("_cookie_issued", 0)
+        return time.time() - issued > app.permanent_session_lifetime.total_seconds() / 2
+
+    def save_session(self, app, session: ServerSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+        if all(key in _META_KEYS for key in session):
+            if not session.new:
+                # Logged out / cleared: forget it on both ends
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add("Cookie")
+            return
+
+        set_cookie = self._cookie_due(app, session)
+        if set_cookie:
+            session["_cookie_issued"] = int(time.time())
+        if session.modified:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), self.idle_ttl)
+            self.saved += 1
+        if set_cookie:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=httponly,
+                domain=domain,
+                path=path,
+                secure=secure,
+                samesite=samesite,
+            )
+            response.vary.add("Cookie")
+            self.cookies_set += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.store.stats(),
+            "idle_ttl": self.idle_ttl,
+            "loaded": self.loaded,
+            "saved": self.saved,
+            "cookies_set": self.cookies_set,
+            "sweeps": self.sweeps,
+        }
+
+
+def make_store(backend: str, path: str | None = None, maxsize: int = 10000):
+    if backend == "memory":
+        return MemoryStore(maxsize=maxsize)
+    if backend == "sqlite":
+        if not path:
+            raise ValueError("The sqlite session store needs a path")
+        return SqliteStore(path)
+    raise ValueError(f"Unknown session backend: {backend}. Must be memory or sqlite")
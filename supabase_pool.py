@@ -0,0 +1,112 @@
+from __future__ import annotations
+"""
+Taaza Mandi – pooled Supabase clients
+- One httpx transport (keep-alive connection pool) shared by every request
+  and thread, including the anon client
+- Per-user clients are thin PostgREST / Storage wrappers that only carry the
+  user's Authorization header; no new session, TLS context or sockets
+- Pool limits are configurable; request / new-connection counters show reuse
+- Optional per-call timing hook (service, method, status, seconds)
+"""
+
+import threading
+import time
+
+import httpx
+from postgrest import SyncPostgrestClient
+from storage3 import SyncStorageClient
+from supabase import Client, ClientOptions, create_client
+
+
+class UserClient:
+    """The parts of ``supabase.Client`` the app uses, scoped to one user's JWT."""
+
+    __slots__ = ("postgrest", "storage")
+
+    def __init__(self, postgrest: SyncPostgrestClient, storage: SyncStorageClient):
+        self.postgrest = postgrest
+        self.storage = storage
+
+    def table(self, name: str):
+        return self.postgrest.from_(name)
+
+
+class SupabasePool:
+    """Shares one HTTP connection pool across all Supabase clients."""
+
+    def __init__(self, url: str, anon_key: str, max_connections: int = 20,
+                 max_keepalive: int = 10, keepalive_expiry: float = 30.0,
+                 timeout: float = 20.0, http2: bool = True, transport=None, observe=None):
+        self.url = url.rstrip("/")
+        self.anon_key = anon_key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http = httpx.Client(
+            limits=self.limits,
+            timeout=httpx.Timeout(timeout),
+            http2=http2,
+            follow_redirects=True,
+            transport=transport,
+            event_hooks={"request": [self._on_request], "response": [self._on_response]},
+        )
+        # observe(service, method, status, seconds) after every complete response
+        self.observe = observe
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.user_clients = 0
+
+    def _on_request(self, request: httpx.Request) -> None:
+        # httpcore reports a TCP connect only when the pool had nothing to reuse
+        request.extensions["trace"] = self._trace
+        request.extensions["started"] = time.perf_counter()
+        with self._lock:
+            self.requests += 1
+
+    def _on_response(self, response: httpx.Response) -> None:
+        if self.observe is None:
+            return
+        response.read()  # time the whole body, not just the headers
+        request = response.request
+        # /rest/v1/products -> rest, /storage/v1/object/... -> storage, /auth/v1/... -> auth
+        service = request.url.path.lstrip("/").split("/", 1)[0] or "other"
+        elapsed = time.perf_counter() - request.extensions.get("started", time.perf_counter())
+        self.observe(service, request.method, response.status_code, elapsed)
+
+    def _trace(self, event: str, info: dict) -> None:
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+
+    def anon_client(self) -> Client:
+        """A full supabase client (auth included) that uses the shared pool."""
+        return create_client(self.url, self.anon_key, options=ClientOptions(httpx_client=self.http))
+
+    def for_user(self, token: str) -> UserClient:
+        """Token-authenticated client so RLS policies using auth() apply."""
+        headers = {"apiKey": self.anon_key, "Authorization": f"Bearer {token}"}
+        with self._lock:
+            self.user_clients += 1
+        return UserClient(
+            SyncPostgrestClient(f"{self.url}/rest/v1", headers=headers, http_client=self.http),
+            SyncStorageClient(f"{self.url}/storage/v1/", headers=headers, http_client=self.http),
+        )
+
+    def close(self) -> None:
+        self.http.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            reused = max(self.requests - self.connections, 0)
+            return {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+                "requests": self.requests,
+                "connections_opened": self.connections,
+                "reuse_rate": round(reused / self.requests, 4) if self.requests else 0.0,
+                "user_clients": self.user_clients,
+            }
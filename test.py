@@ -1 +1,22 @@
+from search import SearchIndex
 
+
+def _index(*titles):
+    index = SearchIndex()
+    index.replace_all(
+        {"id": i, "title": title, "description": "", "category": "Vegetables", "location": "Pune", "price": "10"}
+        for i, title in enumerate(titles)
+    )
+    return index
+
+
+def test_synonym_is_not_fuzzy_expanded():
+    # "tamatar" is one trigram-edit from "matar" (peas); it must only reach tomato
+    index = _index("Fresh Peas", "Desi Tomato")
+    assert set(index.expand("tamatar", is_last=False)) == {"tomato"}
+    assert [p["title"] for p in index.search("tamatar")["products"]] == ["Desi Tomato"]
+
+
+def test_typo_still_fuzzy_expanded():
+    index = _index("Fresh Peas", "Desi Tomato")
+    assert "tomato" in index.expand("tomatto", is_last=False)
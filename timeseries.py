@@ -0,0 +1,235 @@
+from __future__ import annotations
+"""
+Taaza Mandi – price time series
+- Append-only, array-backed storage per (commodity, state) series
+- Daily, weekly and monthly rollups maintained as points are appended
+- Range queries pick the finest rollup that fits the requested point budget,
+  so a chart costs O(points shown) rather than O(raw records)
+"""
+
+import numpy as np
+
+RESOLUTIONS = ("day", "week", "month")
+
+# Per-bucket accumulators; averages are derived when points are read
+_SUMS = ("records", "modal_sum", "modal_n", "arrivals")
+_FIELDS = _SUMS + ("min_price", "max_price")
+
+
+def bucket_start(days: np.ndarray, resolution: str) -> np.ndarray:
+    """First day (days since epoch) of the bucket each day falls in."""
+    days = np.asarray(days, dtype=np.int64)
+    if resolution == "day":
+        return days
+    if resolution == "week":
+        # 1970-01-01 was a Thursday; weeks start on Monday
+        return days - (days + 3) % 7
+    if resolution == "month":
+        months = days.astype("datetime64[D]").astype("datetime64[M]")
+        return months.astype("datetime64[D]").astype(np.int64)
+    raise ValueError(f"Invalid resolution: {resolution}. Must be one of {', '.join(RESOLUTIONS)}")
+
+
+def _group_starts(*keys: np.ndarray) -> np.ndarray:
+    """Indices where any of the (sorted) key arrays changes value."""
+    change = np.zeros(len(keys[0]), dtype=bool)
+    change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def _reduce(points: dict, first: np.ndarray) -> dict:
+    """Combine consecutive point runs starting at ``first`` into buckets."""
+    out = {name: np.add.reduceat(points[name], first) for name in _SUMS}
+    out["min_price"] = np.fmin.reduceat(points["min_price"], first)
+    out["max_price"] = np.fmax.reduceat(points["max_price"], first)
+    return out
+
+
+def _points(records, modal_price, min_price, max_price, arrivals) -> dict:
+    modal = np.asarray(modal_price, dtype=np.float64)
+    present = ~np.isnan(modal)
+    return {
+        "records": np.asarray(records, dtype=np.float64),
+        "modal_sum": np.where(present, modal, 0.0),
+        "modal_n": present.astype(np.float64),
+        "arrivals": np.nan_to_num(np.asarray(arrivals, dtype=np.float64)),
+        "min_price": np.asarray(min_price, dtype=np.float64),
+        "max_price": np.asarray(max_price, dtype=np.float64),
+    }
+
+
+class Rollup:
+    """Buckets for one resolution, stored in growable arrays sorted by start day."""
+
+    def __init__(self, resolution: str, capacity: int = 16):
+        self.resolution = resolution
+        self.size = 0
+        self.start = np.empty(capacity, dtype=np.int32)
+        self.data = {name: np.empty(capacity, dtype=np.float64) for name in _FIELDS}
+
+    @classmethod
+    def from_buckets(cls, resolution: str, start: np.ndarray, data: dict) -> "Rollup":
+        """Wrap already-reduced, sorted buckets (used for bulk builds).
+
+        The arrays are adopted as-is; the first append copies them into
+        growable storage.
+        """
+        rollup = cls.__new__(cls)
+        rollup.resolution = resolution
+        rollup.size = len(start)
+        rollup.start = start.astype(np.int32)
+        rollup.data = data
+        return rollup
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.start)
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 16)
+        while capacity < needed:
+            capacity *= 2
+        self.start = np.resize(self.start, capacity)
+        self.data = {name: np.resize(values, capacity) for name, values in self.data.items()}
+
+    def extend(self, days: np.ndarray, points: dict) -> None:
+        """Fold daily points (sorted by day, not before the last one) into buckets."""
+        keys = bucket_start(days, self.resolution)
+        if self.size and keys[0] < self.start[self.size - 1]:
+            raise ValueError("Series points must be appended in date order")
+
+        first = _group_starts(keys)
+        incoming = _reduce(points, first)
+        keys = keys[first]
+
+        # The first incoming bucket may continue the last stored one
+        if self.size and keys[0] == self.start[self.size - 1]:
+            last = self.size - 1
+            for name in _SUMS:
+                self.data[name][last] += incoming[name][0]
+            self.data["min_price"][last] = np.fmin(self.data["min_price"][last], incoming["min_price"][0])
+            self.data["max_price"][last] = np.fmax(self.data["max_price"][last], incoming["max_price"][0])
+            keys = keys[1:]
+            incoming = {name: values[1:] for name, values in incoming.items()}
+
+        n = len(keys)
+        if not n:
+            return
+        self._grow(self.size + n)
+        self.start[self.size:self.size + n] = keys
+        for name in _FIELDS:
+            self.data[name][self.size:self.size + n] = incoming[name]
+        self.size += n
+
+    def span(self, day_from: int | None, day_to: int | None) -> tuple:
+        """Index range of buckets overlapping ``[day_from, day_to]``."""
+        starts = self.start[:self.size]
+        lo = 0 if day_from is None else int(np.searchsorted(starts, bucket_start(day_from, self.resolution), "left"))
+        hi = self.size if day_to is None else int(np.searchsorted(starts, day_to, "right"))
+        return lo, hi
+
+    def points(self, lo: int, hi: int) -> list:
+        d = {name: values[lo:hi] for name, values in self.data.items()}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            modal = np.round(d["modal_sum"] / d["modal_n"], 2)
+
+        def clean(values):
+            return [float(v) if np.isfinite(v) else None for v in values]
+
+        return [
+            {"date": date, "records": records, "modal_price": m, "min_price": low, "max_price": high, "arrivals": a}
+            for date, records, m, low, high, a in zip(
+                np.datetime_as_string(self.start[lo:hi].astype("datetime64[D]")).tolist(),
+                d["records"].astype(np.int64).tolist(),
+                clean(modal),
+                clean(np.round(d["min_price"], 2)),
+                clean(np.round(d["max_price"], 2)),
+                np.round(d["arrivals"], 2).tolist(),
+            )
+        ]
+
+
+class Series:
+    """One commodity/state series with all rollups kept in step."""
+
+    def __init__(self):
+        self.rollups = {resolution: Rollup(resolution) for resolution in RESOLUTIONS}
+
+    def extend(self, days: np.ndarray, points: dict) -> None:
+        if len(days):
+            for rollup in self.rollups.values():
+                rollup.extend(days, points)
+
+    def query(self, day_from=None, day_to=None, max_points: int = 90, resolution: str = "auto") -> dict:
+        if resolution == "auto":
+            # Finest resolution whose bucket count in range fits the budget
+            for resolution in RESOLUTIONS:
+                lo, hi = self.rollups[resolution].span(day_from, day_to)
+                if hi - lo <= max_points:
+                    break
+        elif resolution not in self.rollups:
+            raise ValueError(f"Invalid resolution: {resolution}. Must be one of auto, {', '.join(RESOLUTIONS)}")
+        rollup = self.rollups[resolution]
+        lo, hi = rollup.span(day_from, day_to)
+        lo = max(lo, hi - max_points)  # keep the most recent buckets if still too many
+        return {"resolution": resolution, "points": rollup.points(lo, hi)}
+
+
+class SeriesStore:
+    """Series keyed by ``(commodity, state)``; ``""`` means all of them."""
+
+    def __init__(self):
+        self.series: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+    def append(self, key: tuple, days, records, modal_price, min_price, max_price, arrivals) -> None:
+        """Append raw per-record values for one series, sorted by day."""
+        points = _points(records, modal_price, min_price, max_price, arrivals)
+        self.series.setdefault(key, Series()).extend(np.asarray(days, dtype=np.int64), points)
+
+    @classmethod
+    def from_mandi(cls, store) -> "SeriesStore":
+        """Build every commodity/state series from a MandiStore in bulk.
+
+        Buckets for all series are reduced in one vectorised pass per
+        resolution; each series then just wraps its slice.
+        """
+        c, vocab = store.columns, store.vocab
+        out = cls()
+        if not len(store):
+            return out
+        points = _points(np.ones(len(store)), c["modal_price"], c["min_price"], c["max_price"], c["arrivals"])
+        blank = np.full(len(store), -1, dtype=np.int32)
+
+        for commodity, state in ((blank, blank), (c["commodity"], blank), (blank, c["state"]), (c["commodity"], c["state"])):
+            order = np.lexsort((c["day"], state, commodity))
+            commodity_s, state_s, day_s = commodity[order], state[order], c["day"][order]
+            sorted_points = {name: values[order] for name, values in points.items()}
+            series_first = _group_starts(commodity_s, state_s)
+            keys = [
+                (str(vocab["commodity"][ci]) if ci >= 0 else "", str(vocab["state"][si]) if si >= 0 else "")
+                for ci, si in zip(commodity_s[series_first], state_s[series_first])
+            ]
+            for key in keys:
+                out.series[key] = Series()
+
+            for resolution in RESOLUTIONS:
+                bucket = bucket_start(day_s, resolution)
+                first = _group_starts(commodity_s, state_s, bucket)
+                data = _reduce(sorted_points, first)
+                # Bucket index where each series' buckets begin
+                bounds = np.append(np.searchsorted(first, series_first), len(first))
+                for key, lo, hi in zip(keys, bounds[:-1], bounds[1:]):
+                    out.series[key].rollups[resolution] = Rollup.from_buckets(
+                        resolution, bucket[first[lo:hi]], {name: values[lo:hi] for name, values in data.items()}
+                    )
+        return out
+
+    def query(self, commodity: str = "", state: str = "", **kwargs) -> dict | None:
+        series = self.series.get((commodity or "", state or ""))
+        if series is None:
+            return None
+        return series.query(**kwargs)